@@ -1,9 +1,22 @@
-from langchain_ollama import OllamaLLM 
 import re
+import threading
 from enum import Enum, auto
+from typing import NamedTuple
 from enums import AIMode
+import calculator
+import solver
+import generator
+from llmcache import cache, normalize_prompt
+import semcache
+from singleflight import SingleFlight
+from llmrouter import LLMRouter, ModelBackend, create_router
+import config
 
-DEFAULT_MODEL = "phi"
+DEFAULT_MODEL = config.LLM_MODEL
+PRACTICE_TASKS = 5
+NO_NUMBER = "Could not extract number"
+# Каждый запрос в этих режимах должен давать новый ответ, поэтому их не объединяем
+UNIQUE_MODES = (AIMode.GENERATE_TASK, AIMode.PRACTICE)
 
 class ResponseType(Enum):
     """Тип запрашиваемого ответа от модели."""
@@ -11,7 +24,76 @@ class ResponseType(Enum):
     EXPLANATION = auto()  # Развернутое объяснение
     CONCISE = auto()      # Краткий ответ
 
+
+class GenerationProfile(NamedTuple):
+    """Ограничения генерации для режима: лишние токены — это лишнее время и нагрузка на Ollama."""
+    num_predict: int                   # наибольшая длина ответа в токенах
+    temperature: float | None = None   # None — значение модели по умолчанию
+    stop: tuple[str, ...] = ()         # генерация обрывается на первой найденной строке
+    max_input_chars: int = 2000        # более длинный текст пользователя обрезается
+
+    def options(self) -> dict:
+        """Параметры запроса к Ollama (options)."""
+        options = {"num_predict": self.num_predict}
+        if self.temperature is not None:
+            options["temperature"] = self.temperature
+        if self.stop:
+            options["stop"] = list(self.stop)
+        return options
+
+
+GENERATION_PROFILES = {
+    # Нужно только условие: решение и ответ санитайзер всё равно отбрасывает.
+    # Стоп-строки ищутся в любом месте ответа, поэтому только с начала строки:
+    # "Решение" или "ответ" внутри условия задачи не должны его обрывать
+    AIMode.GENERATE_TASK: GenerationProfile(120, 0.9, ("\nРешение", "\nОтвет", "\nSolution", "\nAnswer"), 300),
+    AIMode.PRACTICE: GenerationProfile(700, 0.8, (), 300),
+    AIMode.EXPLAIN: GenerationProfile(1024, 0.3, (), 500),
+    AIMode.TIPS: GenerationProfile(400, 0.5, (), 500),
+    AIMode.PLAN: GenerationProfile(600, 0.5, (), 500),
+    AIMode.HELP_PROBLEM: GenerationProfile(800, 0.2, (), 2000),
+    AIMode.CHECK_SOLUTION: GenerationProfile(800, 0.2, (), 3000),
+}
+DEFAULT_PROFILE = GenerationProfile(512)
+# Не "\n": ответ, начатый с перевода строки, оборвался бы пустым
+CALCULATION_PROFILE = GenerationProfile(32, 0.0, ("\n\n",))
+
+
+def generation_profile(mode: AIMode | None, response_type: ResponseType | None = None) -> GenerationProfile:
+    if response_type == ResponseType.CALCULATION:
+        return CALCULATION_PROFILE
+    return GENERATION_PROFILES.get(mode, DEFAULT_PROFILE)
+
+
+def truncate_input(text: str, limit: int) -> str:
+    """Обрезает текст до `limit` символов по границе слова."""
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    space = cut.rfind(" ")
+    return (cut[:space] if space > limit // 2 else cut).rstrip() + "…"
+
+
+_router = None
+_router_lock = threading.Lock()
+flights = SingleFlight()  # одинаковые запросы, выполняющиеся одновременно, генерируются один раз
+
+
+def shared_router() -> LLMRouter:
+    """Единый на процесс роутер: клиенты бэкендов не хранят состояния запроса и переиспользуют HTTP-соединения."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = create_router()
+    return _router
+
+
 class LLM:
+    """Фасад модели без состояния запроса: промпт собирается локально в каждом вызове.
+
+    Один экземпляр можно вызывать из нескольких потоков одновременно.
+    """
     ROLES = {
         "math teacher": {
             "base": "You are a helpful math teacher.",
@@ -21,55 +103,58 @@ class LLM:
         }
     }
 
-    def __init__(self):
-        self.model = OllamaLLM(model=DEFAULT_MODEL)
-
+    def __init__(self, role: str | None = None, model=None, router: LLMRouter | None = None):
+        """`model` — одна модель вместо роутера (например, в скриптах); без model и router — общий роутер процесса."""
         self.role = ""
-        self.task = ""
-        self.prompt = ""
-        self.response_type = ResponseType.EXPLANATION  # По умолчанию объяснение
+        if role is not None:
+            self.set_role(role)
+        if router is None and model is not None:
+            router = LLMRouter({"model": ModelBackend("model", model)})
+        self._router = router
+
+    @property
+    def router(self) -> LLMRouter:
+        return self._router if self._router is not None else shared_router()
 
     def set_role(self, role: str) -> None:
-        """Устанавливает роль подсказки (поддерживается только 'math teacher')."""
+        """Устанавливает роль подсказки (поддерживается только 'math teacher').
+
+        Это настройка экземпляра, а не запроса: меняйте её до того, как экземпляр начнут использовать потоки.
+        """
         if role not in self.ROLES:
             raise ValueError("Unsupported model role selected")
         self.role = self.ROLES[role]["base"]
 
-    def set_response_type(self, response_type: ResponseType) -> None:
-        """Меняет тип ответа модели (влияет на формирование промпта)."""
-        self.response_type = response_type
-
     def calculate(self, expression: str) -> str:
-        """Возвращает только числовой результат выражения, без пояснений."""
-        self.response_type = ResponseType.CALCULATION
+        """Возвращает только числовой результат выражения, без пояснений.
+
+        Сначала выражение вычисляется локально и точно; модель вызывается,
+        только если калькулятор не смог его разобрать.
+        """
         expression = self._normalize_expression(expression)
-        self.task = f"Calculate: {expression}"
-        self._update_prompt()
-        return self.run()
+        try:
+            return calculator.evaluate(expression)
+        except calculator.CalculationError:
+            pass
+        return self.run(self._make_prompt(ResponseType.CALCULATION, f"Calculate: {expression}"), ResponseType.CALCULATION)
 
     def explain(self, topic: str) -> str:
         """Пишет развернутое объяснение темы с примерами и шагами."""
-        self.response_type = ResponseType.EXPLANATION
-        self.task = f"Explain: {topic}"
-        self._update_prompt()
-        return self.run()
-
-    def ask(self, question: str) -> str:
-        """Даёт краткий ответ на вопрос."""
-        self.response_type = ResponseType.CONCISE
-        self.task = question
-        self._update_prompt()
-        return self.run()
-
-    def _update_prompt(self):
-        if self.response_type == ResponseType.CALCULATION:
+        return self.run(self._make_prompt(ResponseType.EXPLANATION, f"Explain: {topic}"), ResponseType.EXPLANATION)
+
+    def ask(self, question: str, mode: AIMode | None = None) -> str:
+        """Даёт краткий ответ на вопрос. `mode` определяет срок хранения ответа в кэше."""
+        return self.run(self._make_prompt(ResponseType.CONCISE, question), ResponseType.CONCISE, mode)
+
+    def _make_prompt(self, response_type: ResponseType, task: str) -> str:
+        if response_type == ResponseType.CALCULATION:
             instruction = self.ROLES["math teacher"]["calculation"]
-        elif self.response_type == ResponseType.EXPLANATION:
+        elif response_type == ResponseType.EXPLANATION:
             instruction = self.ROLES["math teacher"]["explanation"]
         else:
             instruction = self.ROLES["math teacher"]["concise"]
-        
-        self.prompt = f"{self.role} {instruction} {self.task}"
+
+        return f"{self.role} {instruction} {task}"
 
     def _normalize_expression(self, expr: str) -> str:
         """Нормализует текстовые описания операций в форму, понятную модели."""
@@ -86,23 +171,71 @@ class LLM:
             expr = expr.replace(k, v)
         return expr
 
-    def run(self) -> str:
-        response_text = self.model.invoke(self.prompt)
-        if self.response_type == ResponseType.CALCULATION:
-            return self._extract_number(response_text)
-            
+    def run(self, prompt: str, response_type: ResponseType = ResponseType.EXPLANATION,
+            mode: AIMode | None = None) -> str:
+        key = None
+        if cache is not None:
+            key = cache.key(self._route_name(mode, response_type), mode, response_type, prompt)
+            cached = cache.get(key, mode)
+            if cached is not None:
+                return cached
+
+        options = generation_profile(mode, response_type).options()
+        response_text = self.router.invoke(prompt, options, mode, response_type)
+        if response_type == ResponseType.CALCULATION:
+            response_text = self._extract_number(response_text)
+
+        if key is not None and response_text != NO_NUMBER:
+            cache.put(key, mode, response_text)
         return response_text
 
+    def stream(self, prompt: str, response_type: ResponseType = ResponseType.EXPLANATION,
+               mode: AIMode | None = None):
+        """Как run, но отдаёт ответ модели частями по мере генерации (без извлечения числа)."""
+        key = None
+        if cache is not None:
+            key = cache.key(self._route_name(mode, response_type), mode, response_type, prompt)
+            cached = cache.get(key, mode)
+            if cached is not None:
+                yield cached
+                return
+
+        options = generation_profile(mode, response_type).options()
+        parts = []
+        for piece in self.router.stream(prompt, options, mode, response_type):
+            parts.append(piece)
+            yield piece
+
+        if key is not None:
+            cache.put(key, mode, "".join(parts))
+
+    def _route_name(self, mode: AIMode | None, response_type: ResponseType) -> str:
+        """Имя маршрута для ключа кэша: ответы разных наборов моделей не смешиваются."""
+        return ",".join(self.router.route(mode, response_type))
+
     def _extract_number(self, text: str) -> str:
         """Извлекает число из текста ответа"""
         matches = re.findall(r"-?\d+\.?\d*", text)
-        return matches[0] if matches else "Could not extract number"
+        return matches[0] if matches else NO_NUMBER
 
     def respond(self, mode: AIMode | None, user_text: str) -> str:
-        """Формирует промпт по режиму и возвращает ответ модели."""
+        """Формирует промпт по режиму и возвращает ответ модели.
+
+        Одинаковые запросы (режим и нормализованный текст), пришедшие, пока первый
+        ещё генерируется, получают его ответ без отдельного обращения к модели.
+        """
+        if mode in UNIQUE_MODES:
+            return self._respond(mode, user_text)
+        return flights.do(self._flight_key(mode, user_text), self._respond, mode, user_text)
+
+    def _respond(self, mode: AIMode | None, user_text: str) -> str:
         try:
+            answer = self._ready_answer(mode, user_text)
+            if answer is not None:
+                return answer
             prompt = self._build_prompt(mode, user_text)
-            answer = self.ask(prompt)
+            answer = self.ask(prompt, mode)
+            self._remember(mode, user_text, answer)
             if mode == AIMode.GENERATE_TASK:
                 return self._sanitize_generated_task(answer)
             return answer
@@ -110,10 +243,73 @@ class LLM:
             print(f"Ошибка LLM.respond: {e}")
             return "Произошла ошибка при обработке запроса AI"
 
+    def generate_task(self, topic: str) -> str:
+        """Одна задача по теме от модели, минуя шаблоны generator (для пула готовых задач)."""
+        prompt = self._build_prompt(AIMode.GENERATE_TASK, topic)
+        return self._sanitize_generated_task(self.ask(prompt, AIMode.GENERATE_TASK))
+
+    def respond_stream(self, mode: AIMode | None, user_text: str):
+        """Как respond, но отдаёт ответ частями по мере генерации."""
+        if mode == AIMode.GENERATE_TASK:
+            # Условие задачи чистится по полному ответу, поэтому его не стримим
+            yield self.respond(mode, user_text)
+            return
+        if mode in UNIQUE_MODES:
+            yield from self._respond_stream(mode, user_text)
+            return
+        yield from flights.stream(self._flight_key(mode, user_text), self._respond_stream, mode, user_text)
+
+    def _respond_stream(self, mode: AIMode | None, user_text: str):
+        try:
+            answer = self._ready_answer(mode, user_text)
+            if answer is not None:
+                yield answer
+                return
+            prompt = self._make_prompt(ResponseType.CONCISE, self._build_prompt(mode, user_text))
+            parts = []
+            for piece in self.stream(prompt, ResponseType.CONCISE, mode):
+                parts.append(piece)
+                yield piece
+            self._remember(mode, user_text, "".join(parts))
+        except Exception as e:
+            print(f"Ошибка LLM.respond_stream: {e}")
+            yield "\nПроизошла ошибка при обработке запроса AI"
+
+    def _flight_key(self, mode: AIMode | None, user_text: str) -> tuple:
+        return self.role, mode, normalize_prompt(user_text)
+
+    def _ready_answer(self, mode: AIMode | None, user_text: str) -> str | None:
+        """Ответ без генерации: локальный решатель, шаблоны задач или семантический кэш."""
+        if mode == AIMode.HELP_PROBLEM:
+            # Школьные уравнения и неравенства решаем локально, без модели
+            solution = solver.solve(user_text)
+            if solution:
+                return solution
+        if mode in (AIMode.GENERATE_TASK, AIMode.PRACTICE):
+            # Задачи по темам теории генерируются по шаблонам, без модели
+            topic = generator.find_topic(user_text)
+            if topic:
+                if mode == AIMode.GENERATE_TASK:
+                    return generator.format_task(generator.generate(topic)[0])
+                return generator.format_practice(generator.generate(topic, PRACTICE_TASKS))
+        if semcache.cache is not None and mode in semcache.SEMANTIC_MODES:
+            # Похожий по смыслу вопрос уже задавали — отдаём готовое объяснение
+            return semcache.cache.lookup(mode, user_text)
+        return None
+
+    @staticmethod
+    def _remember(mode: AIMode | None, user_text: str, answer: str) -> None:
+        if semcache.cache is not None and mode in semcache.SEMANTIC_MODES:
+            semcache.cache.add(mode, user_text, answer)
+
     @staticmethod
     def _build_prompt(mode: AIMode | None, text: str) -> str:
-        """Создаёт промпт к LLM на основе выбранного режима AI."""
+        """Создаёт промпт к LLM на основе выбранного режима AI.
+
+        Текст пользователя обрезается до max_input_chars профиля режима.
+        """
         try:
+            text = truncate_input(text, generation_profile(mode).max_input_chars)
             if mode == AIMode.HELP_PROBLEM:
                 return f"Реши пошагово задачу, объясняя ход решения на русском языке: {text}"
             if mode == AIMode.EXPLAIN:
@@ -191,3 +387,7 @@ class LLM:
         except Exception as e:
             print(f"Ошибка санитизации текста задачи в LLM: {e}")
             return "Не удалось сгенерировать задачу"
+
+
+# Общий экземпляр для обработчиков бота
+assistant = LLM()
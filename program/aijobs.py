@@ -0,0 +1,112 @@
+import threading
+from collections import deque
+import config
+from outbound import scheduler as outbound, PRIORITY_BULK
+
+
+class AIJobQueue:
+    """Очередь запросов к модели с фиксированным числом воркеров.
+
+    Генерация идёт вне потоков обработки обновлений, поэтому обычные команды
+    не ждут модель. У чата может быть только один запрос в работе; пока он
+    выполняется, в чат периодически отправляется статус «печатает».
+    """
+
+    def __init__(self, bot_instance, workers: int = config.AI_WORKERS,
+                 queue_limit: int = config.AI_QUEUE_LIMIT, typing_interval: float = config.AI_TYPING_INTERVAL):
+        self.bot = bot_instance
+        self.workers = max(1, workers)
+        self.queue_limit = queue_limit
+        self.typing_interval = typing_interval
+
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._stopped = threading.Event()
+        self._jobs = deque()          # (chat_id, function, args, kwargs)
+        self._chats: set[str] = set() # чаты с запросом в очереди или в работе
+        self._active: set[str] = set()
+        self._running = False
+        self._threads = []
+
+    def start(self) -> None:
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        self._stopped.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"ai-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._typing, name="ai-typing", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self, wait: bool = True) -> None:
+        with self._lock:
+            self._running = False
+            self._ready.notify_all()
+        self._stopped.set()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        self._threads = []
+
+    def submit(self, chat_id: str, function: callable, *args, **kwargs) -> bool:
+        """Ставит запрос в очередь. False — очередь заполнена или у чата уже есть запрос."""
+        chat_id = str(chat_id)
+        with self._lock:
+            if chat_id in self._chats or len(self._jobs) >= self.queue_limit:
+                return False
+            self._chats.add(chat_id)
+            run_now = not self._running
+            if not run_now:
+                self._jobs.append((chat_id, function, args, kwargs))
+                self._ready.notify()
+        if run_now:
+            # Без запущенных воркеров (например, в скриптах) выполняем сразу
+            self._execute(chat_id, function, args, kwargs)
+        return True
+
+    def has_job(self, chat_id: str) -> bool:
+        with self._lock:
+            return str(chat_id) in self._chats
+
+    def pending(self) -> int:
+        """Запросы в очереди и в работе."""
+        with self._lock:
+            return len(self._chats)
+
+    def _worker(self) -> None:
+        while True:
+            with self._lock:
+                while self._running and not self._jobs:
+                    self._ready.wait()
+                if not self._running:
+                    return
+                chat_id, function, args, kwargs = self._jobs.popleft()
+            self._execute(chat_id, function, args, kwargs)
+
+    def _execute(self, chat_id: str, function: callable, args, kwargs) -> None:
+        with self._lock:
+            self._active.add(chat_id)
+        self._send_typing(chat_id)
+        try:
+            function(*args, **kwargs)
+        except Exception as e:
+            print(f"Ошибка в запросе к AI (чат {chat_id}): {e}")
+        finally:
+            with self._lock:
+                self._active.discard(chat_id)
+                self._chats.discard(chat_id)
+
+    def _typing(self) -> None:
+        while not self._stopped.wait(self.typing_interval):
+            with self._lock:
+                chats = list(self._active)
+            for chat_id in chats:
+                self._send_typing(chat_id)
+
+    def _send_typing(self, chat_id: str) -> None:
+        # Статус не должен задерживать настоящие ответы, поэтому идёт в низкоприоритетной очереди
+        outbound.send(self.bot.send_chat_action, chat_id, "typing", priority=PRIORITY_BULK)
@@ -0,0 +1,93 @@
+import hashlib
+import io
+import os
+import tempfile
+import config
+import resource
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CHUNK_SIZE = 64 * 1024
+COMPRESSED_SUFFIX = ".zst"
+
+
+class BlobStore:
+    """Хранилище файлов, адресуемое по sha256 содержимого.
+
+    Одинаковые файлы хранятся один раз. Запись и чтение идут потоково,
+    кусками по CHUNK_SIZE. При `compress=True` файлы сжимаются zstd
+    (хэш всегда считается от исходного содержимого). Удаления нет:
+    один файл могут разделять несколько заданий и решений.
+    """
+
+    def __init__(self, root: str = config.BLOB_STORE_PATH, compress: bool = config.BLOB_COMPRESS):
+        self.root = os.path.normpath(os.path.join(resource.PROJECT_ROOT, root))
+        if compress and zstandard is None:
+            print("Пакет zstandard не установлен: файлы будут храниться без сжатия")
+            compress = False
+        self.compress = compress
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, digest: str, compressed: bool) -> str:
+        suffix = COMPRESSED_SUFFIX if compressed else ""
+        return os.path.join(self.root, digest[:2], digest + suffix)
+
+    def _existing_path(self, digest: str) -> str | None:
+        for compressed in (False, True):
+            path = self._path(digest, compressed)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def put(self, source) -> tuple[str, int]:
+        """Сохраняет bytes или двоичный поток. Возвращает (sha256, размер в байтах)."""
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as raw:
+                sink = zstandard.ZstdCompressor().stream_writer(raw, closefd=False) if self.compress else raw
+                for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    sink.write(chunk)
+                if sink is not raw:
+                    sink.close()
+            hexdigest = digest.hexdigest()
+            if self._existing_path(hexdigest) is None:
+                target = self._path(hexdigest, self.compress)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(tmp_path, target)
+                tmp_path = None
+            return hexdigest, size
+        finally:
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def open(self, digest: str):
+        """Открывает файл на потоковое чтение (распаковывая при необходимости)."""
+        path = self._existing_path(digest)
+        if path is None:
+            raise FileNotFoundError(digest)
+        file = open(path, "rb")
+        if path.endswith(COMPRESSED_SUFFIX):
+            if zstandard is None:
+                file.close()
+                raise RuntimeError("Для чтения сжатого файла нужен пакет zstandard")
+            return zstandard.ZstdDecompressor().stream_reader(file, closefd=True)
+        return file
+
+    def iter_chunks(self, digest: str):
+        with self.open(digest) as file:
+            yield from iter(lambda: file.read(CHUNK_SIZE), b"")
+
+    def exists(self, digest: str) -> bool:
+        return self._existing_path(digest) is not None
+
+
+blobs = BlobStore()
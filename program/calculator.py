@@ -0,0 +1,251 @@
+"""Точный локальный калькулятор для LLM.calculate.
+
+Разбирает нормализованное выражение (числа, + - * / : ^, скобки, sqrt)
+в дерево и вычисляет его в рациональных числах (fractions.Fraction).
+Если выражение не распознано, бросает CalculationError — тогда
+вычисление передаётся модели.
+"""
+import math
+import re
+from fractions import Fraction
+
+MAX_EXPONENT = 1000        # защита от 10^10^10 и подобных выражений
+MAX_ROOT_DEGREE = 100      # a^(1/q): корни большей степени не считаем
+MAX_RESULT_DIGITS = 1000
+FLOAT_DIGITS = 10          # знаков после запятой для иррациональных результатов
+
+TOKEN_PATTERN = re.compile(r"\s*(?:(\d+(?:[.,]\d+)?)|(sqrt|√)|(\*\*|[-+*/:^()×·−]))")
+OPERATOR_ALIASES = {"**": "^", ":": "/", "×": "*", "·": "*", "−": "-"}
+
+
+class CalculationError(ValueError):
+    """Выражение не удалось разобрать или вычислить локально."""
+
+
+def tokenize(expression: str) -> list[str]:
+    tokens = []
+    position = 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = TOKEN_PATTERN.match(expression, position)
+        if not match:
+            raise CalculationError(f"Неизвестный символ: {expression[position:]!r}")
+        number, function, operator = match.groups()
+        if number is not None:
+            tokens.append(number.replace(",", "."))
+        elif function is not None:
+            tokens.append("sqrt")
+        else:
+            tokens.append(OPERATOR_ALIASES.get(operator, operator))
+        position = match.end()
+        while position < len(expression) and expression[position].isspace():
+            position += 1
+    if not tokens:
+        raise CalculationError("Пустое выражение")
+    return tokens
+
+
+class _Parser:
+    """Рекурсивный спуск:
+
+    expr   := term (("+" | "-") term)*
+    term   := unary (("*" | "/") unary | primary)*   — второе: неявное умножение, 2(3+4)
+    unary  := ("-" | "+") unary | power
+    power  := primary ("^" unary)?
+    primary:= number | "(" expr ")" | "sqrt" unary
+    """
+
+    def __init__(self, tokens: list[str]):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self) -> str | None:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self, expected: str | None = None) -> str:
+        token = self.peek()
+        if token is None or (expected is not None and token != expected):
+            raise CalculationError(f"Ожидалось {expected or 'выражение'}")
+        self.position += 1
+        return token
+
+    def parse(self):
+        tree = self.expr()
+        if self.peek() is not None:
+            raise CalculationError(f"Лишний фрагмент: {self.peek()!r}")
+        return tree
+
+    def expr(self):
+        tree = self.term()
+        while self.peek() in ("+", "-"):
+            tree = (self.take(), tree, self.term())
+        return tree
+
+    def term(self):
+        tree = self.unary()
+        while True:
+            token = self.peek()
+            if token in ("*", "/"):
+                tree = (self.take(), tree, self.unary())
+            elif token == "(" or token == "sqrt":
+                tree = ("*", tree, self.power())
+            else:
+                return tree
+
+    def unary(self):
+        if self.peek() in ("-", "+"):
+            sign = self.take()
+            operand = self.unary()
+            return ("neg", operand) if sign == "-" else operand
+        return self.power()
+
+    def power(self):
+        base = self.primary()
+        if self.peek() == "^":
+            self.take()
+            return ("^", base, self.unary())
+        return base
+
+    def primary(self):
+        token = self.take()
+        if token == "(":
+            tree = self.expr()
+            self.take(")")
+            return tree
+        if token == "sqrt":
+            return ("sqrt", self.unary())
+        if token[0].isdigit():
+            return ("num", Fraction(token))
+        raise CalculationError(f"Неожиданный символ: {token!r}")
+
+
+def parse(expression: str):
+    """Строит дерево выражения из кортежей вида (операция, аргументы...)."""
+    return _Parser(tokenize(expression)).parse()
+
+
+def _exact_root(value: Fraction, degree: int) -> Fraction | None:
+    """Точный корень степени `degree` из неотрицательного рационального числа, если он существует."""
+    numerator = _integer_root(value.numerator, degree)
+    denominator = _integer_root(value.denominator, degree)
+    if numerator is None or denominator is None:
+        return None
+    return Fraction(numerator, denominator)
+
+
+def _integer_root(value: int, degree: int) -> int | None:
+    """Точный целый корень или None. Метод Ньютона в целых: число шагов растёт с длиной числа, не со степенью."""
+    if value < 2:
+        return value
+    if degree == 2:
+        root = math.isqrt(value)
+    else:
+        # Начинаем сверху: 2^ceil(bits / degree) не меньше корня, дальше последовательность убывает
+        root = 1 << -(-value.bit_length() // degree)
+        while True:
+            following = ((degree - 1) * root + value // root ** (degree - 1)) // degree
+            if following >= root:
+                break
+            root = following
+    return root if root ** degree == value else None
+
+
+def _evaluate(tree):
+    operation = tree[0]
+    if operation == "num":
+        return tree[1]
+    if operation == "neg":
+        return -_evaluate(tree[1])
+    if operation == "sqrt":
+        value = _evaluate(tree[1])
+        if value < 0:
+            raise CalculationError("Корень из отрицательного числа")
+        return _root(value, 2)
+
+    left, right = _evaluate(tree[1]), _evaluate(tree[2])
+    if operation == "+":
+        return left + right
+    if operation == "-":
+        return left - right
+    if operation == "*":
+        return left * right
+    if operation == "/":
+        if right == 0:
+            raise CalculationError("Деление на ноль")
+        return left / right
+    if operation == "^":
+        return _real(_power(left, right))
+    raise CalculationError(f"Неизвестная операция: {operation}")
+
+
+def _root(value, degree: int):
+    if isinstance(value, Fraction):
+        exact = _exact_root(value, degree)
+        if exact is not None:
+            return exact
+    return float(value) ** (1 / degree)
+
+
+def _power(base, exponent):
+    if isinstance(exponent, Fraction) and exponent.denominator != 1:
+        # Дробная степень: a^(p/q) = (корень q-й степени из a)^p
+        if exponent.denominator > MAX_ROOT_DEGREE:
+            raise CalculationError("Слишком большая степень корня")
+        if base < 0:
+            raise CalculationError("Дробная степень отрицательного числа")
+        return _power(_root(base, exponent.denominator), Fraction(exponent.numerator))
+    if abs(exponent) > MAX_EXPONENT:
+        raise CalculationError("Слишком большая степень")
+    if base == 0 and exponent < 0:
+        raise CalculationError("Деление на ноль")
+    if isinstance(base, Fraction) and isinstance(exponent, Fraction):
+        digits = max(len(str(base.numerator)), len(str(base.denominator))) * abs(int(exponent))
+        if digits > MAX_RESULT_DIGITS:
+            raise CalculationError("Слишком большой результат")
+        return base ** int(exponent)
+    # Иррациональная степень: у отрицательного основания нет вещественного значения
+    if base < 0 and not float(exponent).is_integer():
+        raise CalculationError("Нецелая степень отрицательного числа")
+    return _real(float(base) ** float(exponent))
+
+
+def _real(value):
+    """float ** float для отрицательного основания даёт complex — такой результат не считаем."""
+    if isinstance(value, complex):
+        raise CalculationError("Результат не является вещественным числом")
+    return value
+
+
+def format_number(value) -> str:
+    """Целое — как целое, конечная десятичная дробь — десятичной, иначе p/q."""
+    if not isinstance(value, (int, float, Fraction)):
+        raise CalculationError("Результат не является вещественным числом")
+    if isinstance(value, int):
+        value = Fraction(value)
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            raise CalculationError("Результат не является конечным числом")
+        text = f"{value:.{FLOAT_DIGITS}f}".rstrip("0").rstrip(".")
+        return "0" if text == "-0" else text
+    if value.denominator == 1:
+        return str(value.numerator)
+    denominator = value.denominator
+    for factor in (2, 5):
+        while denominator % factor == 0:
+            denominator //= factor
+    if denominator == 1:
+        digits = 0
+        while (value * 10 ** digits).denominator != 1:
+            digits += 1
+        scaled = abs(value.numerator * 10 ** digits // value.denominator)
+        sign = "-" if value < 0 else ""
+        return f"{sign}{scaled // 10 ** digits}.{scaled % 10 ** digits:0{digits}d}"
+    return f"{value.numerator}/{value.denominator}"
+
+
+def evaluate(expression: str) -> str:
+    """Вычисляет выражение и возвращает ответ строкой."""
+    try:
+        return format_number(_evaluate(parse(expression)))
+    except (OverflowError, ZeroDivisionError) as e:
+        raise CalculationError(str(e)) from e
@@ -0,0 +1,111 @@
+import os
+import threading
+from types import MappingProxyType
+from typing import NamedTuple
+import config
+import resource
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+TEXT_EXTENSION = ".txt"
+
+
+class TheoryText(NamedTuple):
+    """Неизменяемый текст теории, заранее разбитый на сообщения Telegram."""
+    path: str
+    mtime_ns: int
+    chunks: tuple[str, ...]
+
+
+def split_message(text: str, limit: int = TELEGRAM_MESSAGE_LIMIT) -> tuple[str, ...]:
+    """Разбивает текст на части не длиннее `limit`, по возможности по абзацам и строкам."""
+    chunks = []
+    while len(text) > limit:
+        cut = text.rfind("\n\n", 0, limit)
+        if cut <= 0:
+            cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = text.rfind(" ", 0, limit)
+        if cut <= 0:
+            cut = limit
+        chunks.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    if text.strip() or not chunks:
+        chunks.append(text)
+    return tuple(chunks)
+
+
+class ContentStore:
+    """Держит все текстовые материалы из resource.json в памяти.
+
+    При изменении mtime файла текст перечитывается в фоне, а таблица
+    подменяется целиком, поэтому читатели всегда видят целостный снимок.
+    """
+
+    def __init__(self, paths: list[str], root: str = resource.PROJECT_ROOT,
+                 reload_interval: float = config.CONTENT_RELOAD_INTERVAL):
+        self.paths = tuple(paths)
+        self.root = root
+        self.reload_interval = reload_interval
+        self._texts = MappingProxyType({})
+        self._stop = threading.Event()
+        self._thread = None
+
+    def get(self, path: str) -> TheoryText | None:
+        return self._texts.get(path)
+
+    def load(self) -> None:
+        """Читает все файлы заново."""
+        self._texts = MappingProxyType(self._build({}))
+
+    def reload(self) -> bool:
+        """Перечитывает только изменившиеся файлы. Возвращает True, если что-то изменилось."""
+        current = self._texts
+        updated = self._build(current)
+        if updated == dict(current):
+            return False
+        self._texts = MappingProxyType(updated)
+        return True
+
+    def start_watching(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="content-watcher", daemon=True)
+        self._thread.start()
+
+    def stop_watching(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.reload_interval):
+            try:
+                if self.reload():
+                    print("Материалы теории обновлены")
+            except Exception as e:
+                print(f"Ошибка перезагрузки материалов теории: {e}")
+
+    def _build(self, previous) -> dict[str, TheoryText]:
+        texts = {}
+        for path in self.paths:
+            resolved = os.path.normpath(os.path.join(self.root, path))
+            try:
+                mtime_ns = os.stat(resolved).st_mtime_ns
+                known = previous.get(path)
+                if known is not None and known.mtime_ns == mtime_ns:
+                    texts[path] = known
+                    continue
+                with open(resolved, "r", encoding="utf-8") as file:
+                    texts[path] = TheoryText(path, mtime_ns, split_message(file.read()))
+            except OSError as e:
+                print(f"Не удалось загрузить материал '{path}': {e}")
+                if path in previous:
+                    texts[path] = previous[path]
+        return texts
+
+
+store = ContentStore([path for path in resource.get_values_from_json(resource.resource)
+                      if isinstance(path, str) and path.endswith(TEXT_EXTENSION)])
+store.load()
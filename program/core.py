@@ -1,6 +1,14 @@
 import database
 import config
+import content
+import hashlib
+import io
 import os
+import threading
+from types import MappingProxyType
+from outbound import scheduler as outbound
+
+HASH_CHUNK_SIZE = 64 * 1024
 
 class UserInputError(Exception):
     """Исключение при некорректно введённых данных."""
@@ -29,25 +37,16 @@ class Process:
                 # помечаем как отменённый, останавливаем и уведомляем пользователя
                 self._canceled = True
                 self.stop()
-                try:
-                    if self._bot and self._info:
-                        self._bot.send_message(self._info.get_ID(), "Действие отменено")
-                except Exception:
-                    pass
+                if self._bot and self._info:
+                    outbound.send(self._bot.send_message, self._info.get_ID(), "Действие отменено")
 
     def stop(self):
         self._i = 0
         self._is_active = False
 
     def out(self, text: str, keyboard = None):
-        try:
-            if self._bot and self._info:
-                self._bot.send_message(self._info.get_ID(), text, reply_markup = keyboard)
-        except Exception as e:
-            try:
-                print(f"Не удалось отправить сообщение из процесса: {e}")
-            except Exception:
-                pass
+        if self._bot and self._info:
+            outbound.send(self._bot.send_message, self._info.get_ID(), text, reply_markup = keyboard)
 
     def execute(self):
         try:
@@ -95,48 +94,53 @@ class FileSender:
     VIDEO_EXTENSIONS = ["mp4", "avi", "mkv", "mov", "wmv", "flv", "webm"]
 
     unzipped_text_document = True # позволить боту отправить сразу текст из файла
-    bot = None
-    chat_id = None
+    bot = None # бот по умолчанию, если в push() не передан свой
     
     # Базовая директория проекта (на уровень выше папки program)
     PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 
+    # Общие для всех экземпляров кэши: путь -> (content_hash, file_id) и путь -> ((mtime, size), sha256)
+    _file_ids: dict[str, tuple] = {}
+    _hashes: dict[str, tuple] = {}
+    _file_ids_lock = threading.Lock()
+
     def __init__(self, keyboard=None, *args):
+        """Экземпляр неизменяем после создания и может использоваться из нескольких потоков."""
         self.keyboard = keyboard
 
-        self.file_handlers = {}
+        file_handlers = {}
 
         for path in args:
             extension = file_extension(path)
             if extension in self.IMAGE_EXTENSIONS:
-                self.file_handlers[path] = self.__push_image
+                file_handlers[path] = self.__push_image
             elif extension in self.DOCUMENT_EXTENSIONS:
                 if not self.unzipped_text_document:
-                    self.file_handlers[path] = self.__push_document
+                    file_handlers[path] = self.__push_document
                 else:
-                    self.file_handlers[path] = self.__push_unzipped_text_document
+                    file_handlers[path] = self.__push_unzipped_text_document
             elif extension in self.AUDIO_EXTENSIONS:
-                self.file_handlers[path] = self.__push_audio
+                file_handlers[path] = self.__push_audio
             elif extension in self.VIDEO_EXTENSIONS:
-                self.file_handlers[path] = self.__push_video
+                file_handlers[path] = self.__push_video
 
-    @classmethod
-    def set_chat_id(cls, chat_id):
-        cls.chat_id = chat_id
+        self.file_handlers = MappingProxyType(file_handlers)
 
     @classmethod
     def set_bot(cls, bot_instance):
         cls.bot = bot_instance
 
-    def push(self):
+    def push(self, chat_id, bot_instance = None):
+        """Отправляет файлы в чат `chat_id`. Всё состояние вызова передаётся аргументами."""
+        bot_instance = bot_instance or self.bot
         sent = 0
         required_to_send = len(self.file_handlers.keys())
-        for path in self.file_handlers.keys():
+        for path, handler in self.file_handlers.items():
             sent += 1
             if sent == required_to_send:
-                self.file_handlers[path](path, keyboard = None)
+                handler(bot_instance, chat_id, path, keyboard = None)
             else:
-                self.file_handlers[path](path, keyboard = self.keyboard)
+                handler(bot_instance, chat_id, path, keyboard = self.keyboard)
 
     def _resolve_path(self, path: str) -> str:
         """Разрешает путь к файлу относительно cwd или корня проекта."""
@@ -151,32 +155,110 @@ class FileSender:
             print(f"Ошибка разрешения пути '{path}': {e}")
             return path
 
-    def __push_image(self, path: str, keyboard = None, caption: str = None):
-        resolved = self._resolve_path(path)
+    @staticmethod
+    def _read_binary(resolved: str) -> io.BytesIO:
+        """Читает файл в память целиком: отправка идёт позже, из очереди исходящих."""
         with open(resolved, 'rb') as file:
-            self.bot.send_photo(self.chat_id, file, reply_markup = keyboard, caption=caption)
-
-    def __push_document(self, path: str, keyboard = None, caption: str = None):
-        resolved = self._resolve_path(path)
+            data = io.BytesIO(file.read())
+        data.name = os.path.basename(resolved)
+        return data
+
+    def _content_hash(self, resolved: str) -> str:
+        """sha256 файла; пересчитывается только при изменении mtime или размера."""
+        stat = os.stat(resolved)
+        with self._file_ids_lock:
+            cached = self._hashes.get(resolved)
+        if cached and cached[0] == (stat.st_mtime_ns, stat.st_size):
+            return cached[1]
+        digest = hashlib.sha256()
         with open(resolved, 'rb') as file:
-            self.bot.send_document(self.chat_id, file, reply_markup = keyboard, caption=caption)
-
-    def __push_audio(self, path: str, keyboard = None, caption: str = None):
+            for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+        with self._file_ids_lock:
+            self._hashes[resolved] = ((stat.st_mtime_ns, stat.st_size), content_hash)
+        return content_hash
+
+    def _file_id_key(self, resolved: str) -> str:
+        return os.path.relpath(resolved, self.PROJECT_ROOT)
+
+    def _cached_file_id(self, resolved: str, content_hash: str) -> str | None:
+        key = self._file_id_key(resolved)
+        with self._file_ids_lock:
+            cached = self._file_ids.get(key)
+        if cached is None:
+            rows = database.Manager.search_records(database.Tables.FileIds, database.Tables.FileIds.path == key)
+            if rows is None:
+                return None
+            cached = (rows[0]["content_hash"], rows[0]["file_id"]) if rows else (None, None)
+            with self._file_ids_lock:
+                self._file_ids[key] = cached
+        if cached[0] == content_hash:
+            return cached[1]
+        return None
+
+    def _remember_file_id(self, resolved: str, content_hash: str, message) -> None:
+        file_id = extract_file_id(message)
+        if not file_id:
+            return
+        key = self._file_id_key(resolved)
+        with self._file_ids_lock:
+            self._file_ids[key] = (content_hash, file_id)
+        database.Manager.upsert(database.Tables.FileIds(path=key, content_hash=content_hash, file_id=file_id))
+
+    def _forget_file_id(self, resolved: str) -> None:
+        with self._file_ids_lock:
+            self._file_ids[self._file_id_key(resolved)] = (None, None)
+
+    def _push_media(self, method, chat_id, path: str, keyboard = None, caption: str = None):
+        """Отправляет медиафайл, повторно используя file_id, если файл уже загружался."""
         resolved = self._resolve_path(path)
-        with open(resolved, 'rb') as file:
-            self.bot.send_audio(self.chat_id, file, reply_markup = keyboard, caption=caption)
+        content_hash = self._content_hash(resolved)
+        file_id = self._cached_file_id(resolved, content_hash)
 
-    def __push_video(self, path: str, keyboard = None, caption: str = None):
-        resolved = self._resolve_path(path)
-        with open(resolved, 'rb') as file:
-            self.bot.send_video(self.chat_id, file, reply_markup = keyboard, caption=caption)
+        def upload():
+            future = outbound.send(method, chat_id, self._read_binary(resolved), reply_markup = keyboard, caption=caption)
+            future.add_done_callback(on_uploaded)
 
-    def __push_unzipped_text_document(self, path: str, keyboard = None, caption: str = None):
-        resolved = self._resolve_path(path)
-        with open(resolved, 'r', encoding='utf-8') as file:
-            text = file.read()
+        def on_uploaded(future):
+            if future.exception() is None:
+                self._remember_file_id(resolved, content_hash, future.result())
+
+        def on_cached_sent(future):
+            # Загружаем заново, только если Telegram не принял сам file_id (например, сменился токен бота);
+            # при прочих ошибках повторная загрузка тоже не пройдёт и лишь нагрузит канал
+            if is_stale_file_id_error(future.exception()):
+                self._forget_file_id(resolved)
+                upload()
+
+        if file_id:
+            outbound.send(method, chat_id, file_id, reply_markup = keyboard, caption=caption).add_done_callback(on_cached_sent)
+        else:
+            upload()
+
+    def __push_image(self, bot_instance, chat_id, path: str, keyboard = None, caption: str = None):
+        self._push_media(bot_instance.send_photo, chat_id, path, keyboard, caption)
 
-        self.bot.send_message(self.chat_id, f"{text}", reply_markup = keyboard)
+    def __push_document(self, bot_instance, chat_id, path: str, keyboard = None, caption: str = None):
+        self._push_media(bot_instance.send_document, chat_id, path, keyboard, caption)
+
+    def __push_audio(self, bot_instance, chat_id, path: str, keyboard = None, caption: str = None):
+        self._push_media(bot_instance.send_audio, chat_id, path, keyboard, caption)
+
+    def __push_video(self, bot_instance, chat_id, path: str, keyboard = None, caption: str = None):
+        self._push_media(bot_instance.send_video, chat_id, path, keyboard, caption)
+
+    def __push_unzipped_text_document(self, bot_instance, chat_id, path: str, keyboard = None, caption: str = None):
+        theory_text = content.store.get(path)
+        if theory_text is not None:
+            chunks = theory_text.chunks
+        else:
+            resolved = self._resolve_path(path)
+            with open(resolved, 'r', encoding='utf-8') as file:
+                chunks = content.split_message(file.read())
+
+        for i, chunk in enumerate(chunks):
+            outbound.send(bot_instance.send_message, chat_id, chunk, reply_markup = keyboard if i == len(chunks) - 1 else None)
 
 
 class Validator:
@@ -264,6 +346,24 @@ def extractor(collection: list[dict], key) -> list:
     
     return extracted
 
+def extract_file_id(message) -> str | None:
+    """Достаёт file_id из сообщения Telegram с фото, документом, аудио или видео."""
+    photo = getattr(message, "photo", None)
+    if photo:
+        return photo[-1].file_id
+    for attribute in ("document", "audio", "video"):
+        media = getattr(message, attribute, None)
+        if media is not None:
+            return media.file_id
+    return None
+
+def is_stale_file_id_error(error) -> bool:
+    """Ошибка Telegram 400 о недействительном file_id (ApiTelegramException)."""
+    if getattr(error, "error_code", None) != 400:
+        return False
+    description = str(getattr(error, "description", "") or error).lower()
+    return "wrong file identifier" in description or "file reference" in description
+
 def file_extension(path: str) -> str:
     """Определяет расширение файла."""
     return path.split(".")[-1]
@@ -1,11 +1,17 @@
-from sqlalchemy import create_engine, Column, Integer, String, BLOB, text
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import Column, Integer, Float, String, BLOB, Index, inspect, select, text, or_, and_
 from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy.exc import SQLAlchemyError
-from config import PASSWORD_LENGTH
-import resource
+from config import PASSWORD_LENGTH, USER_CACHE_SIZE, USER_CACHE_TTL, ROLE_CACHE_SIZE, ROLE_CACHE_TTL
+import storage
+from blobstore import blobs
 
 Base = declarative_base()
 
+SQLITE_MAX_PARAMS = 500  # с запасом ниже SQLITE_MAX_VARIABLE_NUMBER старых сборок (999)
+
 class Tables:
     class Singly(Base):
         """Таблица заданий и решений"""
@@ -15,9 +21,13 @@ class Tables:
         sender_id = Column(String)         # telegram_id отправителя задания
         recipient_id = Column(String)      # telegram_id получателя задания
         task_filename = Column(String)     # имя файла задания
-        task_file = Column(BLOB)           # файл задания
+        task_hash = Column(String)         # sha256 файла задания в blobstore
+        task_size = Column(Integer)        # размер файла задания в байтах
         solution_filename = Column(String) # имя файла решения
-        solution_file = Column(BLOB)       # файл решения
+        solution_hash = Column(String)     # sha256 файла решения в blobstore
+        solution_size = Column(Integer)    # размер файла решения в байтах
+        task_file = Column(BLOB)           # устарело: содержимое перенесено в blobstore
+        solution_file = Column(BLOB)       # устарело: содержимое перенесено в blobstore
 
     class Users(Base):
         """Таблица зарегестрированных пользователей"""
@@ -29,49 +39,178 @@ class Tables:
         name = Column(String, nullable=False)                      # имя пользователя
         surname = Column(String, nullable=False)                   # фамилия пользователя
         role = Column(String, nullable=False)                      # роль пользователя
-        my_students = Column(String, nullable=True)                # список прикреплённых учеников
+        my_students = Column(String, nullable=True)                # устарело: перенесено в teacher_students
         city = Column(String, nullable=True)                       # город пользователя
         school = Column(Integer, nullable=True)                    # школа пользователя
         grade = Column(String, nullable=True)                      # класс пользователя
-        application = Column(String, nullable=True)                # заявки на прикрепление
-        my_teachers = Column(String, nullable=True)                # список учителей ученика
+        application = Column(String, nullable=True)                # устарело: перенесено в applications
+        my_teachers = Column(String, nullable=True)                # устарело: перенесено в teacher_students
+
+        # Поиск класса учителем: равенство по городу, школе и классу
+        __table_args__ = (Index("ix_users_city_school_grade", "city", "school", "grade"),)
+
+    class TeacherStudents(Base):
+        """Связь учитель — прикреплённый ученик"""
+        __tablename__ = "teacher_students"
+
+        teacher_id = Column(String, primary_key=True)  # telegram_id учителя
+        student_id = Column(String, primary_key=True)  # telegram_id ученика
+
+        __table_args__ = (Index("ix_teacher_students_student", "student_id"),)
+
+    class Applications(Base):
+        """Заявки учителей на прикрепление ученика"""
+        __tablename__ = "applications"
+
+        student_id = Column(String, primary_key=True)  # telegram_id ученика, получившего заявку
+        teacher_id = Column(String, primary_key=True)  # telegram_id учителя, отправившего заявку
+
+        __table_args__ = (Index("ix_applications_teacher", "teacher_id"),)
+
+    class FileIds(Base):
+        """Кэш file_id файлов, уже загруженных в Telegram"""
+        __tablename__ = "file_ids"
+
+        path = Column(String, primary_key=True)        # путь к файлу относительно корня проекта
+        content_hash = Column(String, nullable=False)  # sha256 содержимого на момент загрузки
+        file_id = Column(String, nullable=False)       # file_id, выданный Telegram
+
+    class PooledTasks(Base):
+        """Заранее сгенерированные задачи, ожидающие выдачи (очередь FIFO по id)"""
+        __tablename__ = "pooled_tasks"
+
+        id = Column(Integer, primary_key=True, autoincrement=True)  # порядок постановки в очередь
+        topic = Column(String, nullable=False)      # тема задачи
+        text = Column(String, nullable=False)       # условие задачи после санитизации
+        text_hash = Column(String, nullable=False)  # sha256 нормализованного условия
+
+        __table_args__ = (Index("ix_pooled_tasks_topic_hash", "topic", "text_hash", unique=True),)
 
-relatative_path_database = f"../{resource.resource['database']}"
-engine = create_engine(f"sqlite:///{relatative_path_database}")
+    class IssuedTasks(Base):
+        """Задачи из пула, уже выданные пользователю"""
+        __tablename__ = "issued_tasks"
+
+        telegram_id = Column(String, primary_key=True)  # telegram_id получателя
+        text_hash = Column(String, primary_key=True)    # sha256 нормализованного условия
+        issued_at = Column(Float, nullable=True)        # unix-время выдачи (для очистки старой истории)
+
+        __table_args__ = (Index("ix_issued_tasks_issued_at", "issued_at"),)
+
+    class LLMResponses(Base):
+        """Постоянный кэш ответов модели"""
+        __tablename__ = "llm_responses"
+
+        key = Column(String, primary_key=True)        # sha256 модели, режима, типа ответа и промпта
+        mode = Column(String, nullable=True)          # режим AI (для статистики и очистки)
+        answer = Column(String, nullable=False)       # ответ модели
+        expires_at = Column(Float, nullable=False)    # unix-время, после которого ответ устарел
+
+        __table_args__ = (Index("ix_llm_responses_expires_at", "expires_at"),)
+
+engine = storage.create_storage_engine()
 Base.metadata.create_all(engine)
 
+# create_all не добавляет столбцы и индексы в уже существующие таблицы
+for _table in Base.metadata.sorted_tables:
+    _existing = {column["name"] for column in inspect(engine).get_columns(_table.name)}
+    for _column in _table.columns:
+        if _column.name not in _existing:
+            with engine.begin() as _connection:
+                _type = _column.type.compile(engine.dialect)
+                _connection.execute(text(f'ALTER TABLE {_table.name} ADD COLUMN {_column.name} {_type}'))
+for _table in Base.metadata.sorted_tables:
+    for _index in _table.indexes:
+        _index.create(engine, checkfirst=True)
+
+
+class IdentityMap:
+    """Потокобезопасный LRU-кэш строк с ограничением по времени жизни."""
+
+    def __init__(self, max_size: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._rows = OrderedDict()  # ключ -> (время записи, строка)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._rows.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self._rows[key]
+                return None
+            self._rows.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, row) -> None:
+        with self._lock:
+            self._rows[key] = (time.monotonic(), row)
+            self._rows.move_to_end(key)
+            while len(self._rows) > self.max_size:
+                self._rows.popitem(last=False)
+
+    def invalidate(self, key) -> None:
+        with self._lock:
+            self._rows.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rows.clear()
+
+
+users_cache = IdentityMap()
+roles_cache = IdentityMap(ROLE_CACHE_SIZE, ROLE_CACHE_TTL)
+GUEST_ROLE = ""  # отрицательный кэш: пользователь не зарегистрирован
+
 
 class Client:
     """Читает/изменяет поля пользователя из БД"""
     CHANGEABLE_ATTRIBUTES = ["name", "surname", "password", "role"]
 
-    def __init__(self, telegram_ID: str):
+    def __init__(self, telegram_ID: str, row: dict | None = None):
+        """`row` — уже загруженная строка users (например, из Manager.get_many), чтобы не читать её снова."""
+        if row is None:
+            row = Manager.load_user(telegram_ID) or {}
         self.__dict__["_telegram_id"] = telegram_ID
-        self.__dict__["username"] = self._reader("username")
-        self.__dict__["password"] = self._reader("password")
-        self.__dict__["name"] = self._reader("name")
-        self.__dict__["surname"] = self._reader("surname")
-        self.__dict__["role"] = self._reader("role")
-
-        self.__dict__["my_students"] = None
-        self.__dict__["my_teachers"] = None
-        self.__dict__["application"] = None
+        self.__dict__["username"] = row.get("username")
+        self.__dict__["password"] = row.get("password")
+        self.__dict__["name"] = row.get("name")
+        self.__dict__["surname"] = row.get("surname")
+        self.__dict__["role"] = row.get("role")
+
         self.__dict__["city"] = None
         self.__dict__["school"] = None
         self.__dict__["grade"] = None
 
-        if self.__dict__["role"] == "учитель":
-            self.__dict__["my_students"] = self._reader("my_students")
-
         if self.__dict__["role"] == "ученик":
-            self.__dict__["my_teachers"] = self._reader("my_teachers")
-            self.__dict__["application"] = self._reader("application")
-            self.__dict__["city"] = self._reader("city")
-            self.__dict__["school"] = self._reader("school")
-            self.__dict__["grade"] = self._reader("grade")
+            self.__dict__["city"] = row.get("city")
+            self.__dict__["school"] = row.get("school")
+            self.__dict__["grade"] = row.get("grade")
+
+    @property
+    def my_students(self) -> list[str]:
+        """telegram_id прикреплённых учеников (для учителя)."""
+        if self.role != "учитель":
+            return []
+        return Manager.get_related_ids(Tables.TeacherStudents.student_id, Tables.TeacherStudents.teacher_id == self._telegram_id)
+
+    @property
+    def my_teachers(self) -> list[str]:
+        """telegram_id учителей ученика."""
+        if self.role != "ученик":
+            return []
+        return Manager.get_related_ids(Tables.TeacherStudents.teacher_id, Tables.TeacherStudents.student_id == self._telegram_id)
+
+    @property
+    def application(self) -> list[str]:
+        """telegram_id учителей, приславших заявку ученику."""
+        if self.role != "ученик":
+            return []
+        return Manager.get_related_ids(Tables.Applications.teacher_id, Tables.Applications.student_id == self._telegram_id)
 
     def _reader(self, column: str):
-        return Manager.get_cell(Tables.Users, Tables.Users.telegram_id == self._telegram_id, column)
+        return (Manager.load_user(self._telegram_id) or {}).get(column)
 
     def _redactor(self, column: str, value):
         # Обновляем запись пользователя по telegram_id, указывая имя столбца фильтра явно
@@ -87,11 +226,74 @@ class Client:
     
     def get_ID(self) -> str:
         return self.__dict__.get("_telegram_id")
+
+    @classmethod
+    def load_many(cls, telegram_ids: list[str]) -> list["Client"]:
+        """Загружает пользователей пачкой; отсутствующие в БД пропускаются, порядок сохраняется."""
+        rows = Manager.get_many(telegram_ids)
+        return [cls(telegram_id, rows[telegram_id]) for telegram_id in telegram_ids if telegram_id in rows]
         
 
 class Manager:
     session = sessionmaker(bind=engine)
 
+    @staticmethod
+    def _invalidate(table, column_name: str, value) -> None:
+        """Сбрасывает кэши пользователей и ролей после изменения таблицы users."""
+        if table is not Tables.Users:
+            return
+        if column_name == "telegram_id":
+            users_cache.invalidate(value)
+            roles_cache.invalidate(value)
+        else:
+            users_cache.clear()
+            roles_cache.clear()
+
+    @staticmethod
+    def fetch_user(telegram_id: str) -> dict | None:
+        """Вся строка пользователя одним запросом, минуя кэш. Ошибки БД пробрасываются."""
+        with Manager.session() as session:
+            record = session.get(Tables.Users, telegram_id)
+            if record is None:
+                return None
+            row = Manager.record_to_dict(record)
+        users_cache.put(telegram_id, row)
+        return row
+
+    @staticmethod
+    def load_user(telegram_id: str) -> dict | None:
+        """Вся строка пользователя одним запросом (с кэшем в памяти)."""
+        row = users_cache.get(telegram_id)
+        if row is not None:
+            return row
+        try:
+            return Manager.fetch_user(telegram_id)
+        except SQLAlchemyError as e:
+            return None
+
+    @staticmethod
+    def get_many(telegram_ids: list[str]) -> dict[str, dict]:
+        """Строки users по списку telegram_id запросами `IN (...)` пачками по SQLITE_MAX_PARAMS."""
+        rows = {}
+        missing = []
+        for telegram_id in dict.fromkeys(telegram_ids):
+            row = users_cache.get(telegram_id)
+            if row is not None:
+                rows[telegram_id] = row
+            else:
+                missing.append(telegram_id)
+        try:
+            with Manager.session() as session:
+                for start in range(0, len(missing), SQLITE_MAX_PARAMS):
+                    chunk = missing[start:start + SQLITE_MAX_PARAMS]
+                    for record in session.query(Tables.Users).filter(Tables.Users.telegram_id.in_(chunk)):
+                        row = Manager.record_to_dict(record)
+                        users_cache.put(row["telegram_id"], row)
+                        rows[row["telegram_id"]] = row
+        except SQLAlchemyError as e:
+            print(f"Ошибка пакетной загрузки пользователей: {e}")
+        return rows
+
     @staticmethod
     def write(record):
         session = None
@@ -99,6 +301,8 @@ class Manager:
             session = Manager.session()
             session.add(record)
             session.commit()
+            if isinstance(record, Tables.Users):
+                Manager._invalidate(Tables.Users, "telegram_id", record.telegram_id)
             return True
         except SQLAlchemyError as e:
             if session and session.is_active:
@@ -112,6 +316,25 @@ class Manager:
             if session:
                 session.close()
 
+    @staticmethod
+    def upsert(record):
+        """Вставляет запись или заменяет существующую с тем же первичным ключом."""
+        session = None
+        try:
+            session = Manager.session()
+            session.merge(record)
+            session.commit()
+            if isinstance(record, Tables.Users):
+                Manager._invalidate(Tables.Users, "telegram_id", record.telegram_id)
+            return True
+        except SQLAlchemyError as e:
+            if session and session.is_active:
+                session.rollback()
+            return False
+        finally:
+            if session:
+                session.close()
+
     @staticmethod
     def update_record(table, filter_column: str, filter_value, update_column: str, new_value):
         session = None
@@ -122,6 +345,7 @@ class Manager:
             if record:
                 setattr(record, update_column, new_value)
                 session.commit()
+                Manager._invalidate(table, filter_column, filter_value)
                 return True
             else:
                 return False
@@ -165,6 +389,19 @@ class Manager:
             if session and not use_external_session:
                 session.close()
 
+    @staticmethod
+    def query_plan(table, condition) -> list[str]:
+        """План выполнения SQLite (EXPLAIN QUERY PLAN) для выборки строк `table` по `condition`."""
+        if engine.dialect.name != "sqlite":
+            return []
+        try:
+            with Manager.session() as session:
+                statement = session.query(table).filter(condition).statement
+                sql = str(statement.compile(engine, compile_kwargs={"literal_binds": True}))
+                return [row[-1] for row in session.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+        except SQLAlchemyError as e:
+            return []
+
     @staticmethod
     def delete_record(table, column_name: str, value) -> bool:
         try:
@@ -174,7 +411,10 @@ class Manager:
                 
                 if record_to_delete:
                     session.delete(record_to_delete)
+                    if table is Tables.Users and column_name == "telegram_id":
+                        Manager._delete_relations(session, value)
                     session.commit()
+                    Manager._invalidate(table, column_name, value)
                     return True
                 else:
                     return False
@@ -183,6 +423,211 @@ class Manager:
         except Exception as e:
             return False
 
+    @staticmethod
+    def delete_where(table, condition) -> int:
+        """Удаляет все строки по условию одним запросом. Возвращает число удалённых строк."""
+        try:
+            with Manager.session() as session:
+                deleted = session.query(table).filter(condition).delete(synchronize_session=False)
+                session.commit()
+                return deleted
+        except SQLAlchemyError as e:
+            return 0
+
+    @staticmethod
+    def get_related_ids(column, condition) -> list[str]:
+        """Значения `column` из таблицы связей по условию (один запрос по индексу)."""
+        try:
+            with Manager.session() as session:
+                return [i[0] for i in session.query(column).filter(condition).all()]
+        except SQLAlchemyError as e:
+            return []
+
+    @staticmethod
+    def get_students(teacher_id: str) -> list[dict]:
+        """Строки users всех учеников учителя одним JOIN."""
+        condition = Tables.TeacherStudents.teacher_id == teacher_id
+        return Manager._join_users(Tables.TeacherStudents, Tables.TeacherStudents.student_id, condition)
+
+    @staticmethod
+    def _join_users(link_table, user_column, condition) -> list[dict]:
+        try:
+            with Manager.session() as session:
+                records = (
+                    session.query(Tables.Users)
+                    .join(link_table, user_column == Tables.Users.telegram_id)
+                    .filter(condition)
+                    .order_by(Tables.Users.surname, Tables.Users.name)
+                    .all()
+                )
+                return [Manager.record_to_dict(record) for record in records]
+        except SQLAlchemyError as e:
+            return []
+
+    @staticmethod
+    def attach_students(teacher_id: str, student_ids: list[str]) -> bool:
+        """Прикрепляет учеников к учителю; уже прикреплённые пропускаются."""
+        student_ids = list(dict.fromkeys(student_ids))
+        if not student_ids:
+            return True
+        session = None
+        try:
+            session = Manager.session()
+            existing = {
+                i[0] for i in session.query(Tables.TeacherStudents.student_id).filter(
+                    Tables.TeacherStudents.teacher_id == teacher_id,
+                    Tables.TeacherStudents.student_id.in_(student_ids),
+                )
+            }
+            session.add_all([
+                Tables.TeacherStudents(teacher_id=teacher_id, student_id=student_id)
+                for student_id in student_ids if student_id not in existing
+            ])
+            session.commit()
+            return True
+        except SQLAlchemyError as e:
+            if session and session.is_active:
+                session.rollback()
+            return False
+        finally:
+            if session:
+                session.close()
+
+    @staticmethod
+    def _delete_relations(session, telegram_id: str) -> None:
+        """Удаляет связи, заявки и историю выданных задач пользователя в рамках переданной сессии."""
+        for table in (Tables.TeacherStudents, Tables.Applications):
+            session.query(table).filter(or_(table.teacher_id == telegram_id, table.student_id == telegram_id)).delete()
+        session.query(Tables.IssuedTasks).filter(Tables.IssuedTasks.telegram_id == telegram_id).delete()
+
+    @staticmethod
+    def save_assignment(sender_id: str, recipient_ids: list[str], filename: str, source) -> list[int]:
+        """Сохраняет файл задания один раз и создаёт запись для каждого получателя. Возвращает id записей."""
+        digest, size = blobs.put(source)
+        session = None
+        try:
+            session = Manager.session()
+            records = [
+                Tables.Singly(sender_id=sender_id, recipient_id=recipient_id,
+                              task_filename=filename, task_hash=digest, task_size=size)
+                for recipient_id in recipient_ids
+            ]
+            session.add_all(records)
+            session.commit()
+            return [record.id for record in records]
+        except SQLAlchemyError as e:
+            if session and session.is_active:
+                session.rollback()
+            return []
+        finally:
+            if session:
+                session.close()
+
+    @staticmethod
+    def save_solution(assignment_id: int, filename: str, source) -> bool:
+        """Сохраняет файл решения к заданию."""
+        digest, size = blobs.put(source)
+        session = None
+        try:
+            session = Manager.session()
+            record = session.get(Tables.Singly, assignment_id)
+            if record is None:
+                return False
+            record.solution_filename = filename
+            record.solution_hash = digest
+            record.solution_size = size
+            session.commit()
+            return True
+        except SQLAlchemyError as e:
+            if session and session.is_active:
+                session.rollback()
+            return False
+        finally:
+            if session:
+                session.close()
+
+    @staticmethod
+    def open_assignment_file(assignment_id: int, solution: bool = False):
+        """Открывает файл задания (или решения) на потоковое чтение; None, если файла нет."""
+        column = "solution_hash" if solution else "task_hash"
+        digest = Manager.get_cell(Tables.Singly, Tables.Singly.id == assignment_id, column)
+        if not digest:
+            return None
+        try:
+            return blobs.open(digest)
+        except FileNotFoundError as e:
+            return None
+
+    @staticmethod
+    def pool_size(topic: str) -> int:
+        try:
+            with Manager.session() as session:
+                return session.query(Tables.PooledTasks).filter(Tables.PooledTasks.topic == topic).count()
+        except SQLAlchemyError as e:
+            return 0
+
+    @staticmethod
+    def pool_add(topic: str, text: str, text_hash: str) -> bool:
+        """Ставит задачу в конец очереди темы. False — такая задача уже ждёт выдачи."""
+        session = None
+        try:
+            session = Manager.session()
+            exists = session.query(Tables.PooledTasks.id).filter(
+                Tables.PooledTasks.topic == topic, Tables.PooledTasks.text_hash == text_hash,
+            ).first()
+            if exists:
+                return False
+            session.add(Tables.PooledTasks(topic=topic, text=text, text_hash=text_hash))
+            session.commit()
+            return True
+        except SQLAlchemyError as e:
+            # Гонка с параллельным наполнением упирается в уникальный индекс
+            if session and session.is_active:
+                session.rollback()
+            return False
+        finally:
+            if session:
+                session.close()
+
+    @staticmethod
+    def pool_take(topic: str, telegram_id: str) -> str | None:
+        """Забирает самую старую задачу темы, которую пользователь ещё не получал."""
+        issued = select(Tables.IssuedTasks.text_hash).where(Tables.IssuedTasks.telegram_id == telegram_id)
+        session = None
+        try:
+            session = Manager.session()
+            while True:
+                record = session.query(Tables.PooledTasks).filter(
+                    Tables.PooledTasks.topic == topic,
+                    Tables.PooledTasks.text_hash.not_in(issued),
+                ).order_by(Tables.PooledTasks.id).first()
+                if record is None:
+                    return None
+                task_id, task_text, task_hash = record.id, record.text, record.text_hash
+                # Задачу мог забрать другой поток: удаляем по id и проверяем, что удалили именно мы
+                deleted = session.query(Tables.PooledTasks).filter(Tables.PooledTasks.id == task_id).delete()
+                if deleted:
+                    session.merge(Tables.IssuedTasks(telegram_id=telegram_id, text_hash=task_hash, issued_at=time.time()))
+                    session.commit()
+                    return task_text
+                session.rollback()
+        except SQLAlchemyError as e:
+            if session and session.is_active:
+                session.rollback()
+            return None
+        finally:
+            if session:
+                session.close()
+
+    @staticmethod
+    def prune_issued_tasks(max_age: float) -> int:
+        """Забывает выдачи старше `max_age` секунд: спустя это время задачу можно выдать снова."""
+        cutoff = time.time() - max_age
+        return Manager.delete_where(
+            Tables.IssuedTasks,
+            or_(Tables.IssuedTasks.issued_at.is_(None), Tables.IssuedTasks.issued_at < cutoff),
+        )
+
     @staticmethod
     def get_column(column):
         try:
@@ -192,4 +637,124 @@ class Manager:
             return []
 
 def find_my_role(ID: str):
-    return Manager.get_cell(Tables.Users, Tables.Users.telegram_id == ID, "role")
\ No newline at end of file
+    """Роль пользователя или None для гостя.
+
+    Результат (в том числе «гость») кэшируется; записи в users сбрасывают кэш
+    явно через Manager. Строка пользователя попадает в users_cache, поэтому
+    следующий Client(ID) в том же обновлении не обращается к БД.
+    """
+    role = roles_cache.get(ID)
+    if role is not None:
+        return role or None
+    row = users_cache.get(ID)
+    if row is None:
+        try:
+            row = Manager.fetch_user(ID)
+        except SQLAlchemyError as e:
+            return None
+    role = row.get("role") if row else None
+    roles_cache.put(ID, role or GUEST_ROLE)
+    return role
+
+
+def class_search_condition(city: str, school, grade: str):
+    """Условие поиска учеников класса (использует ix_users_city_school_grade)."""
+    return and_(
+        Tables.Users.city == city,
+        Tables.Users.school == school,
+        Tables.Users.grade == grade,
+    )
+
+
+def check_class_search_plan() -> bool:
+    """Проверяет, что поиск класса идёт по индексу, а не полным сканированием users."""
+    plan = Manager.query_plan(Tables.Users, class_search_condition("город", 1, "1а"))
+    if not plan:
+        return True
+    uses_index = any("USING INDEX ix_users_city_school_grade" in step for step in plan)
+    if not uses_index:
+        print(f"Внимание: поиск класса выполняется без индекса: {plan}")
+    return uses_index
+
+
+def _split_ids(value: str | None) -> list[str]:
+    return [i for i in (value or "").split(";") if i]
+
+
+def migrate_relationships() -> None:
+    """Переносит связи из устаревших строковых столбцов users в таблицы связей.
+
+    После переноса строковые столбцы очищаются, поэтому повторный запуск ничего не делает.
+    """
+    session = None
+    try:
+        session = Manager.session()
+        legacy = session.query(Tables.Users).filter(or_(
+            Tables.Users.my_students.isnot(None),
+            Tables.Users.my_teachers.isnot(None),
+            Tables.Users.application.isnot(None),
+        )).all()
+        if not legacy:
+            return
+
+        links, applications = set(), set()
+        for user in legacy:
+            for student_id in _split_ids(user.my_students):
+                links.add((user.telegram_id, student_id))
+            for teacher_id in _split_ids(user.my_teachers):
+                links.add((teacher_id, user.telegram_id))
+            for teacher_id in _split_ids(user.application):
+                applications.add((user.telegram_id, teacher_id))
+            user.my_students = None
+            user.my_teachers = None
+            user.application = None
+
+        links -= set(session.query(Tables.TeacherStudents.teacher_id, Tables.TeacherStudents.student_id).all())
+        applications -= set(session.query(Tables.Applications.student_id, Tables.Applications.teacher_id).all())
+        session.add_all([Tables.TeacherStudents(teacher_id=t, student_id=s) for t, s in links])
+        session.add_all([Tables.Applications(student_id=s, teacher_id=t) for s, t in applications])
+        session.commit()
+        users_cache.clear()
+    except SQLAlchemyError as e:
+        print(f"Не удалось перенести связи учителей и учеников: {e}")
+        if session and session.is_active:
+            session.rollback()
+    finally:
+        if session:
+            session.close()
+
+
+def migrate_assignment_files() -> None:
+    """Переносит BLOB-файлы заданий и решений из users.db в blobstore."""
+    session = None
+    try:
+        session = Manager.session()
+        legacy_ids = [i[0] for i in session.query(Tables.Singly.id).filter(or_(
+            Tables.Singly.task_file.isnot(None),
+            Tables.Singly.solution_file.isnot(None),
+        ))]
+        # По одной записи за раз, чтобы не держать все файлы в памяти
+        for assignment_id in legacy_ids:
+            record = session.get(Tables.Singly, assignment_id)
+            if record.task_file is not None:
+                record.task_hash, record.task_size = blobs.put(record.task_file)
+                record.task_file = None
+            if record.solution_file is not None:
+                record.solution_hash, record.solution_size = blobs.put(record.solution_file)
+                record.solution_file = None
+            session.commit()
+            session.expunge(record)
+        if legacy_ids:
+            print(f"Файлы заданий перенесены в хранилище: {len(legacy_ids)}")
+    except SQLAlchemyError as e:
+        print(f"Не удалось перенести файлы заданий: {e}")
+        if session and session.is_active:
+            session.rollback()
+    finally:
+        if session:
+            session.close()
+
+
+migrate_relationships()
+migrate_assignment_files()
+check_class_search_plan()
@@ -0,0 +1,91 @@
+import threading
+from collections import deque
+import config
+
+
+class Dispatcher:
+    """Пул воркеров для обработки обновлений.
+
+    Обновления одного чата выполняются строго по очереди, обновления разных
+    чатов — параллельно и не блокируют друг друга.
+    """
+
+    def __init__(self, workers: int = config.DISPATCHER_WORKERS,
+                 queue_limit: int = config.DISPATCHER_QUEUE_LIMIT,
+                 chat_queue_limit: int = config.DISPATCHER_CHAT_QUEUE_LIMIT):
+        self.workers = max(1, workers)
+        self.queue_limit = queue_limit
+        self.chat_queue_limit = chat_queue_limit
+
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._chats: dict[str, deque] = {}  # chat_id -> очередь задач чата
+        self._runnable = deque()            # чаты, готовые к выполнению
+        self._pending = 0
+        self._running = False
+        self._threads = []
+
+    def start(self) -> None:
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"dispatcher-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, wait: bool = True) -> None:
+        with self._lock:
+            self._running = False
+            self._ready.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        self._threads = []
+
+    def submit(self, chat_id: str, function: callable, *args, **kwargs) -> bool:
+        """Ставит задачу в очередь чата. Возвращает False, если очередь переполнена."""
+        with self._lock:
+            if self._pending >= self.queue_limit:
+                return False
+            chat_queue = self._chats.get(chat_id)
+            if chat_queue is None:
+                chat_queue = deque()
+                self._chats[chat_id] = chat_queue
+                self._runnable.append(chat_id)
+                self._ready.notify()
+            elif len(chat_queue) >= self.chat_queue_limit:
+                return False
+            chat_queue.append((function, args, kwargs))
+            self._pending += 1
+            return True
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._pending
+
+    def _worker(self) -> None:
+        while True:
+            with self._lock:
+                while self._running and not self._runnable:
+                    self._ready.wait()
+                if not self._running:
+                    return
+                # Чат попадает в _runnable только один раз, поэтому
+                # его задачи никогда не выполняются двумя воркерами сразу
+                chat_id = self._runnable.popleft()
+                function, args, kwargs = self._chats[chat_id].popleft()
+
+            try:
+                function(*args, **kwargs)
+            except Exception as e:
+                print(f"Ошибка в обработчике диспетчера (чат {chat_id}): {e}")
+
+            with self._lock:
+                self._pending -= 1
+                if self._chats[chat_id]:
+                    self._runnable.append(chat_id)
+                    self._ready.notify()
+                else:
+                    del self._chats[chat_id]
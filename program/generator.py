@@ -0,0 +1,309 @@
+"""Генератор задач по темам теории без обращения к модели.
+
+Каждая тема — шаблон со случайными коэффициентами, для которого ответ
+известен заранее. При одинаковом seed задачи повторяются, что удобно
+для вариантов контрольных.
+"""
+import math
+import random
+import re
+from fractions import Fraction
+from typing import NamedTuple
+from calculator import format_number
+from solver import format_polynomial
+
+DIFFICULTY_EASY = 1
+DIFFICULTY_MEDIUM = 2
+DIFFICULTY_HARD = 3
+
+# Наибольший модуль коэффициентов по уровням сложности
+COEFFICIENT_LIMITS = {DIFFICULTY_EASY: 5, DIFFICULTY_MEDIUM: 10, DIFFICULTY_HARD: 20}
+
+MAX_TASKS_PER_CALL = 100
+
+
+class Task(NamedTuple):
+    topic: str
+    text: str
+    answer: str
+
+
+def _nonzero(rng: random.Random, limit: int, negative: bool = True) -> int:
+    value = rng.randint(1, limit)
+    return -value if negative and rng.random() < 0.5 else value
+
+
+def _linear(a: int, b: int) -> str:
+    return format_polynomial({1: a, 0: b})
+
+
+def _factor(k: int) -> str:
+    """Общий множитель перед скобками; единица не пишется."""
+    return str(k) if k != 1 else ""
+
+
+# --- Формулы сокращённого умножения -------------------------------------------
+
+def _square_of_sum(rng, limit):
+    a, b = rng.randint(1, limit), rng.randint(1, limit)
+    return f"Раскройте скобки: ({_linear(a, b)})²", format_polynomial({2: a * a, 1: 2 * a * b, 0: b * b})
+
+
+def _square_of_difference(rng, limit):
+    a, b = rng.randint(1, limit), rng.randint(1, limit)
+    return f"Раскройте скобки: ({_linear(a, -b)})²", format_polynomial({2: a * a, 1: -2 * a * b, 0: b * b})
+
+
+def _difference_of_squares(rng, limit):
+    a, b = rng.randint(1, limit), rng.randint(1, limit)
+    # Сначала выносим общий множитель: 4x² − 36 = 4(x − 3)(x + 3)
+    g = math.gcd(a, b)
+    return (f"Разложите на множители: {format_polynomial({2: a * a, 0: -b * b})}",
+            f"{_factor(g * g)}({_linear(a // g, -b // g)})({_linear(a // g, b // g)})")
+
+
+def _cube_of_sum(rng, limit):
+    a, b = rng.randint(1, max(2, limit // 3)), rng.randint(1, max(2, limit // 2))
+    return (f"Раскройте скобки: ({_linear(a, b)})³",
+            format_polynomial({3: a ** 3, 2: 3 * a * a * b, 1: 3 * a * b * b, 0: b ** 3}))
+
+
+def _cube_of_difference(rng, limit):
+    a, b = rng.randint(1, max(2, limit // 3)), rng.randint(1, max(2, limit // 2))
+    return (f"Раскройте скобки: ({_linear(a, -b)})³",
+            format_polynomial({3: a ** 3, 2: -3 * a * a * b, 1: 3 * a * b * b, 0: -b ** 3}))
+
+
+def _sum_of_cubes(rng, limit):
+    a, b = rng.randint(1, max(2, limit // 3)), rng.randint(1, max(2, limit // 2))
+    g = math.gcd(a, b)
+    p, q = a // g, b // g
+    return (f"Разложите на множители: {format_polynomial({3: a ** 3, 0: b ** 3})}",
+            f"{_factor(g ** 3)}({_linear(p, q)})({format_polynomial({2: p * p, 1: -p * q, 0: q * q})})")
+
+
+def _difference_of_cubes(rng, limit):
+    a, b = rng.randint(1, max(2, limit // 3)), rng.randint(1, max(2, limit // 2))
+    g = math.gcd(a, b)
+    p, q = a // g, b // g
+    return (f"Разложите на множители: {format_polynomial({3: a ** 3, 0: -b ** 3})}",
+            f"{_factor(g ** 3)}({_linear(p, -q)})({format_polynomial({2: p * p, 1: p * q, 0: q * q})})")
+
+
+# --- Уравнения и неравенства -------------------------------------------------
+
+def _linear_equation(rng, limit):
+    root = _nonzero(rng, limit)
+    a = _nonzero(rng, limit)
+    c = rng.randint(-limit, limit)
+    while c == a:
+        c = rng.randint(-limit, limit)
+    b = rng.randint(-limit * 2, limit * 2)
+    d = (a - c) * root + b
+    return (f"Решите уравнение: {format_polynomial({1: a, 0: b})} = {format_polynomial({1: c, 0: d})}",
+            f"x = {root}")
+
+
+def _incomplete_quadratic_bx(rng, limit):
+    a, root = _nonzero(rng, max(2, limit // 2)), _nonzero(rng, limit)
+    return (f"Решите уравнение: {format_polynomial({2: a, 1: -a * root})} = 0",
+            f"x₁ = 0, x₂ = {root}")
+
+
+def _incomplete_quadratic_c(rng, limit):
+    a, root = _nonzero(rng, max(2, limit // 2)), rng.randint(1, limit)
+    return (f"Решите уравнение: {format_polynomial({2: a, 0: -a * root * root})} = 0",
+            f"x₁ = {root}, x₂ = {-root}")
+
+
+def _quadratic_discriminant(rng, limit):
+    a = _nonzero(rng, max(1, limit // 5)) if limit > DIFFICULTY_EASY * 5 else 1
+    x1, x2 = _distinct_sum_roots(rng, limit)
+    return (f"Решите уравнение через дискриминант: {format_polynomial({2: a, 1: -a * (x1 + x2), 0: a * x1 * x2})} = 0",
+            _roots_answer(x1, x2))
+
+
+def _quadratic_vieta(rng, limit):
+    x1, x2 = _distinct_sum_roots(rng, limit)
+    return (f"Решите уравнение по теореме Виета: {format_polynomial({2: 1, 1: -(x1 + x2), 0: x1 * x2})} = 0",
+            _roots_answer(x1, x2))
+
+
+def _distinct_sum_roots(rng, limit) -> tuple[int, int]:
+    """Ненулевые корни с ненулевой суммой, чтобы уравнение было полным (b ≠ 0, c ≠ 0)."""
+    x1 = _nonzero(rng, limit)
+    x2 = _nonzero(rng, limit)
+    while x1 + x2 == 0:
+        x2 = _nonzero(rng, limit)
+    return x1, x2
+
+
+def _roots_answer(x1: int, x2: int) -> str:
+    if x1 == x2:
+        return f"x = {x1}"
+    x1, x2 = sorted((x1, x2), reverse=True)
+    return f"x₁ = {x1}, x₂ = {x2}"
+
+
+def _linear_inequality(rng, limit):
+    a, bound = _nonzero(rng, limit), rng.randint(-limit, limit)
+    b = rng.randint(-limit * 2, limit * 2)
+    relation = rng.choice(["<", ">", "≤", "≥"])
+    answer_relation = relation if a > 0 else {"<": ">", ">": "<", "≤": "≥", "≥": "≤"}[relation]
+    return (f"Решите неравенство: {format_polynomial({1: a, 0: b})} {relation} {a * bound + b}",
+            f"x {answer_relation} {bound}")
+
+
+# --- Вычисления и тригонометрия ----------------------------------------------
+
+def _fractions(rng, limit):
+    def fraction():
+        denominator = rng.randint(2, max(3, limit))
+        return Fraction(rng.randint(1, denominator * 2), denominator)
+
+    left, right = fraction(), fraction()
+    operation = rng.choice(["+", "-", "×", ":"])
+    result = {"+": left + right, "-": left - right, "×": left * right, ":": left / right}[operation]
+    show = lambda value: f"{value.numerator}/{value.denominator}" if value.denominator != 1 else str(value.numerator)
+    return f"Вычислите: {show(left)} {operation} {show(right)}", show(result)
+
+
+SIN = {0: Fraction(0), 30: Fraction(1, 2), 90: Fraction(1), 150: Fraction(1, 2), 180: Fraction(0),
+       210: Fraction(-1, 2), 270: Fraction(-1), 330: Fraction(-1, 2)}
+COS = {0: Fraction(1), 60: Fraction(1, 2), 90: Fraction(0), 120: Fraction(-1, 2), 180: Fraction(-1),
+       240: Fraction(-1, 2), 270: Fraction(0), 300: Fraction(1, 2)}
+
+
+def _trigonometric_functions(rng, limit):
+    k1, k2 = _nonzero(rng, min(limit, 6)), _nonzero(rng, min(limit, 6))
+    angle1, angle2 = rng.choice(list(SIN)), rng.choice(list(COS))
+    value = k1 * SIN[angle1] + k2 * COS[angle2]
+    sign = "+" if k2 > 0 else "-"
+    return (f"Вычислите: {_trig_term(k1, 'sin', angle1)} {sign} {_trig_term(abs(k2), 'cos', angle2)}",
+            format_number(value))
+
+
+def _trig_term(k: int, function: str, angle: int) -> str:
+    prefix = "" if k == 1 else ("-" if k == -1 else str(k))
+    return f"{prefix}{function} {angle}°"
+
+
+TRIGONOMETRIC_EQUATIONS = [
+    ("sin", Fraction(0), "x = πn, n ∈ Z"),
+    ("sin", Fraction(1), "x = π/2 + 2πn, n ∈ Z"),
+    ("sin", Fraction(-1), "x = -π/2 + 2πn, n ∈ Z"),
+    ("sin", Fraction(1, 2), "x = (-1)ⁿ·π/6 + πn, n ∈ Z"),
+    ("cos", Fraction(0), "x = π/2 + πn, n ∈ Z"),
+    ("cos", Fraction(1), "x = 2πn, n ∈ Z"),
+    ("cos", Fraction(-1), "x = π + 2πn, n ∈ Z"),
+    ("cos", Fraction(1, 2), "x = ±π/3 + 2πn, n ∈ Z"),
+    ("tg", Fraction(1), "x = π/4 + πn, n ∈ Z"),
+    ("tg", Fraction(0), "x = πn, n ∈ Z"),
+]
+
+
+def _trigonometric_equation(rng, limit):
+    function, value, answer = rng.choice(TRIGONOMETRIC_EQUATIONS)
+    k = rng.randint(1, min(limit, 5))
+    left = f"{function} x" if k == 1 else f"{k}{function} x"
+    return f"Решите уравнение: {left} = {format_number(value * k)}", answer
+
+
+# Названия тем совпадают с ключами theory.algebra_theory
+TEMPLATES = {
+    "квадрат суммы": _square_of_sum,
+    "квадрат разности": _square_of_difference,
+    "разность квадратов": _difference_of_squares,
+    "куб суммы": _cube_of_sum,
+    "куб разности": _cube_of_difference,
+    "сумма кубов": _sum_of_cubes,
+    "разность кубов": _difference_of_cubes,
+    "линейные уравнения": _linear_equation,
+    "уравнения вида ax² + bx = 0": _incomplete_quadratic_bx,
+    "уравнения вида ax² + c = 0": _incomplete_quadratic_c,
+    "квадратные уравнения (дескриминант)": _quadratic_discriminant,
+    "квадратные уравнения (виет)": _quadratic_vieta,
+    "линейные неравенства": _linear_inequality,
+    "действия с обычными дробями": _fractions,
+    "основные тригонометрические функции": _trigonometric_functions,
+    "тригонометрические уравнения": _trigonometric_equation,
+}
+
+# Распознавание темы в свободном тексте. Только однозначные формулировки тем шаблонов:
+# "показательные уравнения" или "десятичные дроби" генератор не покрывает — их решает модель.
+# Порядок важен: от частного к общему
+_SQUARE = r"(?:²|\^\s*2)"
+TOPIC_PATTERNS = [
+    (r"квадрат\w*\s+суммы", "квадрат суммы"),
+    (r"квадрат\w*\s+разности", "квадрат разности"),
+    (r"разност\w*\s+квадратов", "разность квадратов"),
+    (r"куб\w*\s+суммы", "куб суммы"),
+    (r"куб\w*\s+разности", "куб разности"),
+    (r"сумм\w*\s+кубов", "сумма кубов"),
+    (r"разност\w*\s+кубов", "разность кубов"),
+    (rf"ax{_SQUARE}\s*\+\s*bx\s*\+\s*c", "квадратные уравнения (дескриминант)"),
+    (rf"ax{_SQUARE}\s*\+\s*c\b", "уравнения вида ax² + c = 0"),
+    (rf"ax{_SQUARE}\s*\+\s*bx", "уравнения вида ax² + bx = 0"),
+    (r"виет", "квадратные уравнения (виет)"),
+    (r"дискриминант|дескриминант", "квадратные уравнения (дескриминант)"),
+    (r"тригонометрическ\w*\s+уравнени", "тригонометрические уравнения"),
+    (r"тригонометрическ\w*\s+функци", "основные тригонометрические функции"),
+    (r"линейн\w*\s+неравенств", "линейные неравенства"),
+    (r"линейн\w*\s+уравнени", "линейные уравнения"),
+    (r"(?:обычн|обыкновенн)\w*\s+дроб", "действия с обычными дробями"),
+]
+TOPIC_PATTERNS = [(re.compile(pattern), topic) for pattern, topic in TOPIC_PATTERNS]
+
+# Уточнения, с которыми тема уже не та, что в шаблоне: "системы линейных уравнений", "... с модулем"
+NOT_TEMPLATE_PATTERN = re.compile(r"систем|модул|параметр")
+
+
+def find_topic(text: str) -> str | None:
+    """Определяет тему генератора по тексту запроса или None, если тема не поддерживается."""
+    text = text.lower().replace("ё", "е").strip()
+    if text in TEMPLATES:
+        return text
+    if NOT_TEMPLATE_PATTERN.search(text):
+        return None
+    for pattern, topic in TOPIC_PATTERNS:
+        if pattern.search(text):
+            return topic
+    return None
+
+
+def generate(topic: str, count: int = 1, difficulty: int = DIFFICULTY_MEDIUM, seed: int | None = None) -> list[Task]:
+    """Генерирует `count` задач с ответами по теме (название темы или свободный текст)."""
+    canonical = find_topic(topic)
+    if canonical is None:
+        raise KeyError(f"Неизвестная тема: {topic}")
+    template = TEMPLATES[canonical]
+    limit = COEFFICIENT_LIMITS.get(difficulty, COEFFICIENT_LIMITS[DIFFICULTY_MEDIUM])
+    rng = random.Random(seed)
+    tasks, seen = [], set()
+    attempts = 0
+    count = min(max(count, 0), MAX_TASKS_PER_CALL)
+    # Повторы допускаются, только если у шаблона кончились различные варианты
+    while len(tasks) < count and attempts < count * 20:
+        attempts += 1
+        text, answer = template(rng, limit)
+        if text in seen:
+            continue
+        seen.add(text)
+        tasks.append(Task(canonical, text, answer))
+    while len(tasks) < count:
+        text, answer = template(rng, limit)
+        tasks.append(Task(canonical, text, answer))
+    return tasks
+
+
+def format_task(task: Task) -> str:
+    """Одна задача в том же виде, что и ответ модели в режиме GENERATE_TASK."""
+    return f"Задача: {task.text}"
+
+
+def format_practice(tasks: list[Task]) -> str:
+    """Набор задач с ответами в конце (формат режима PRACTICE)."""
+    lines = [f"Задача {i}: {task.text}" for i, task in enumerate(tasks, start=1)]
+    lines += ["", "Ответы:"]
+    lines += [f"{i}) {task.answer}" for i, task in enumerate(tasks, start=1)]
+    return "\n".join(lines)
@@ -88,6 +88,8 @@ class Student:
     
     ai_helper = create_keyboard(
         ["/главная"],
+        ["Объяснить теорию", "Помощь с задачей"],
+        ["Получить советы", "План обучения"],
         ["Сгенерировать задание", "Проверить решение"]
     )
     
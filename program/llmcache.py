@@ -0,0 +1,112 @@
+import hashlib
+import re
+import threading
+import time
+import config
+import database
+from enums import AIMode
+
+DAY = 24 * 3600
+
+# Время жизни ответа по режимам (секунды); 0 — режим не кэшируется.
+# Задачи должны быть разными при каждом запросе, поэтому их не кэшируем
+MODE_TTLS = {
+    AIMode.EXPLAIN: 7 * DAY,
+    AIMode.TIPS: 7 * DAY,
+    AIMode.PLAN: 3 * DAY,
+    AIMode.HELP_PROBLEM: config.LLM_CACHE_TTL,
+    AIMode.CHECK_SOLUTION: config.LLM_CACHE_TTL,
+    AIMode.PRACTICE: 0,
+    AIMode.GENERATE_TASK: 0,
+}
+
+
+def normalize_prompt(text: str) -> str:
+    """Приводит промпт к виду, в котором одинаковые по смыслу запросы совпадают побайтно."""
+    text = re.sub(r"\s+", " ", text.lower().replace("ё", "е")).strip()
+    return text.rstrip(" ?!.")
+
+
+class ResponseCache:
+    """Кэш ответов модели: LRU в памяти и, по желанию, таблица llm_responses в БД.
+
+    Ключ — sha256 от модели, режима, типа ответа и нормализованного промпта.
+    """
+
+    def __init__(self, max_size: int = config.LLM_CACHE_SIZE, persistent: bool = config.LLM_CACHE_PERSISTENT,
+                 default_ttl: float = config.LLM_CACHE_TTL, mode_ttls: dict | None = None):
+        self.default_ttl = default_ttl
+        self.mode_ttls = MODE_TTLS if mode_ttls is None else mode_ttls
+        self.persistent = persistent
+        # Срок годности хранится в самой записи, поэтому TTL карты — наибольший из режимов
+        self._memory = database.IdentityMap(max_size, max([default_ttl, *self.mode_ttls.values()]))
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        if persistent:
+            self.purge_expired()
+
+    def ttl(self, mode: AIMode | None) -> float:
+        return self.mode_ttls.get(mode, self.default_ttl)
+
+    @staticmethod
+    def key(model: str, mode: AIMode | None, response_type, prompt: str) -> str:
+        parts = (model, mode.value if mode else "", response_type.name, normalize_prompt(prompt))
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str, mode: AIMode | None = None) -> str | None:
+        if self.ttl(mode) <= 0:
+            return None
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None and entry[0] > now:
+            self._count("memory_hits")
+            return entry[1]
+        if self.persistent:
+            rows = database.Manager.search_records(database.Tables.LLMResponses, database.Tables.LLMResponses.key == key)
+            if rows and rows[0]["expires_at"] > now:
+                self._memory.put(key, (rows[0]["expires_at"], rows[0]["answer"]))
+                self._count("persistent_hits")
+                return rows[0]["answer"]
+        self._count("misses")
+        return None
+
+    def put(self, key: str, mode: AIMode | None, answer: str) -> None:
+        ttl = self.ttl(mode)
+        if ttl <= 0 or not answer:
+            return
+        expires_at = time.time() + ttl
+        self._memory.put(key, (expires_at, answer))
+        if self.persistent:
+            database.Manager.upsert(database.Tables.LLMResponses(
+                key=key, mode=mode.value if mode else None, answer=answer, expires_at=expires_at,
+            ))
+
+    def purge_expired(self) -> int:
+        return database.Manager.delete_where(
+            database.Tables.LLMResponses, database.Tables.LLMResponses.expires_at <= time.time(),
+        )
+
+    def clear(self) -> None:
+        self._memory.clear()
+        if self.persistent:
+            database.Manager.delete_where(database.Tables.LLMResponses, database.Tables.LLMResponses.key.isnot(None))
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.persistent_hits
+            total = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "hit_rate": hits / total if total else 0.0,
+            }
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+
+cache = ResponseCache() if config.LLM_CACHE_ENABLED else None
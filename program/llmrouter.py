@@ -0,0 +1,219 @@
+"""Маршрутизация запросов к модели между несколькими бэкендами.
+
+Каждому режиму AI или типу ответа сопоставлен упорядоченный список
+бэкендов. Для каждого бэкенда ведётся скользящая статистика задержек
+(p50/p95) и ошибок; медленные и падающие бэкенды пропускаются вперёд
+остальных, а при ошибке запрос уходит следующему по списку.
+"""
+import json
+import threading
+import time
+from collections import deque
+import config
+
+MIN_SAMPLES = 5               # меньше запросов — статистике ещё не верим
+MAX_CONSECUTIVE_FAILURES = 3  # столько ошибок подряд — бэкенд уходит на паузу
+
+
+class RouterError(Exception):
+    """Ни один бэкенд маршрута не смог ответить."""
+
+
+class ModelBackend:
+    """Бэкенд поверх модели LangChain с методами invoke/stream(prompt, options=...), например OllamaLLM."""
+
+    def __init__(self, name: str, model):
+        self.name = name
+        self.model = model
+
+    def invoke(self, prompt: str, options: dict) -> str:
+        return self.model.invoke(prompt, options=options)
+
+    def stream(self, prompt: str, options: dict):
+        yield from self.model.stream(prompt, options=options)
+
+
+class ChatBackend(ModelBackend):
+    """OpenAI-совместимый бэкенд через обёртку ChatOpenAI из utils."""
+
+    def invoke(self, prompt: str, options: dict) -> str:
+        return self.model.invoke(prompt, **self._params(options)).content
+
+    def stream(self, prompt: str, options: dict):
+        for chunk in self.model.stream(prompt, **self._params(options)):
+            yield chunk.content
+
+    @staticmethod
+    def _params(options: dict) -> dict:
+        params = {"max_tokens": options.get("num_predict")}
+        if "temperature" in options:
+            params["temperature"] = options["temperature"]
+        if options.get("stop"):
+            params["stop"] = options["stop"]
+        return params
+
+
+def create_backend(name: str, spec: dict, timeout: float = config.LLM_BACKEND_TIMEOUT) -> ModelBackend:
+    kind = spec.get("kind", "ollama")
+    if kind == "ollama":
+        from langchain_ollama import OllamaLLM
+        model = OllamaLLM(model=spec.get("model", config.LLM_MODEL), base_url=spec.get("base_url"),
+                          client_kwargs={"timeout": timeout})
+        return ModelBackend(name, model)
+    if kind == "openai":
+        from utils import ChatOpenAI
+        model = ChatOpenAI(course_api_key=spec.get("api_key") or config.LLM_API_KEY, model=spec["model"],
+                           base_url=spec.get("base_url"), timeout=timeout, max_retries=0)
+        return ChatBackend(name, model)
+    raise ValueError(f"Неизвестный тип бэкенда: {kind}")
+
+
+class BackendStats:
+    """Скользящее окно последних запросов к бэкенду."""
+
+    def __init__(self, window: int = config.LLM_ROUTER_WINDOW):
+        self._samples = deque(maxlen=max(1, window))  # (секунды, успех)
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+
+    def record(self, latency: float, ok: bool) -> None:
+        self._samples.append((latency, ok))
+        self.consecutive_failures = 0 if ok else self.consecutive_failures + 1
+
+    def percentile(self, fraction: float) -> float | None:
+        latencies = sorted(latency for latency, ok in self._samples if ok)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+
+    def error_rate(self) -> float:
+        if not self._samples:
+            return 0.0
+        return sum(1 for _, ok in self._samples if not ok) / len(self._samples)
+
+    def samples(self) -> int:
+        return len(self._samples)
+
+
+class LLMRouter:
+    """Выбирает бэкенд для запроса и переключается на следующий при ошибке."""
+
+    def __init__(self, backends: dict, routes: dict | None = None, default: list[str] | None = None,
+                 window: int = config.LLM_ROUTER_WINDOW, slow_p95: float = config.LLM_ROUTER_SLOW_P95,
+                 max_error_rate: float = config.LLM_ROUTER_MAX_ERROR_RATE,
+                 cooldown: float = config.LLM_ROUTER_COOLDOWN):
+        if not backends:
+            raise ValueError("Нужен хотя бы один бэкенд")
+        self.backends = dict(backends)
+        self.routes = {self._route_key(key): list(names) for key, names in (routes or {}).items()}
+        self.default = list(default or self.backends)
+        for names in [self.default, *self.routes.values()]:
+            unknown = [name for name in names if name not in self.backends]
+            if unknown:
+                raise ValueError(f"Неизвестные бэкенды в маршруте: {unknown}")
+        self.slow_p95 = slow_p95
+        self.max_error_rate = max_error_rate
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._stats = {name: BackendStats(window) for name in self.backends}
+
+    @staticmethod
+    def _route_key(key) -> str:
+        """Режим AI (AIMode) или тип ответа (ResponseType) — либо их строковое имя."""
+        if hasattr(key, "value") and isinstance(key.value, str):
+            return key.value
+        if hasattr(key, "name"):
+            return key.name.lower()
+        return str(key).lower()
+
+    def route(self, mode=None, response_type=None) -> list[str]:
+        """Настроенный маршрут: сначала по режиму, затем по типу ответа, иначе по умолчанию."""
+        for key in (mode, response_type):
+            if key is not None and self._route_key(key) in self.routes:
+                return self.routes[self._route_key(key)]
+        return self.default
+
+    def candidates(self, mode=None, response_type=None) -> list[str]:
+        """Маршрут с учётом здоровья: исправные, затем медленные, затем стоящие на паузе."""
+        now = time.monotonic()
+        route = self.route(mode, response_type)
+        with self._lock:
+            def tier(name: str) -> int:
+                stats = self._stats[name]
+                if stats.cooldown_until > now:
+                    return 2
+                p95 = stats.percentile(0.95)
+                if stats.samples() >= MIN_SAMPLES and p95 is not None and p95 > self.slow_p95:
+                    return 1
+                return 0
+            return sorted(route, key=lambda name: (tier(name), route.index(name)))
+
+    def invoke(self, prompt: str, options: dict, mode=None, response_type=None) -> str:
+        errors = []
+        for name in self.candidates(mode, response_type):
+            started = time.monotonic()
+            try:
+                result = self.backends[name].invoke(prompt, options)
+            except Exception as e:
+                self._record(name, time.monotonic() - started, False)
+                print(f"Бэкенд модели {name} не ответил: {e}")
+                errors.append(f"{name}: {e}")
+                continue
+            self._record(name, time.monotonic() - started, True)
+            return result
+        raise RouterError("; ".join(errors) or "Нет доступных бэкендов")
+
+    def stream(self, prompt: str, options: dict, mode=None, response_type=None):
+        """Переключение возможно только до первой части ответа: начатый ответ не склеиваем из разных моделей."""
+        errors = []
+        for name in self.candidates(mode, response_type):
+            started = time.monotonic()
+            produced = False
+            try:
+                for piece in self.backends[name].stream(prompt, options):
+                    produced = True
+                    yield piece
+            except GeneratorExit:
+                raise
+            except Exception as e:
+                self._record(name, time.monotonic() - started, False)
+                print(f"Бэкенд модели {name} не ответил: {e}")
+                if produced:
+                    raise
+                errors.append(f"{name}: {e}")
+                continue
+            self._record(name, time.monotonic() - started, True)
+            return
+        raise RouterError("; ".join(errors) or "Нет доступных бэкендов")
+
+    def _record(self, name: str, latency: float, ok: bool) -> None:
+        with self._lock:
+            stats = self._stats[name]
+            stats.record(latency, ok)
+            if ok:
+                return
+            too_many_errors = stats.samples() >= MIN_SAMPLES and stats.error_rate() >= self.max_error_rate
+            if too_many_errors or stats.consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+                stats.cooldown_until = time.monotonic() + self.cooldown
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    "samples": stats.samples(),
+                    "p50": stats.percentile(0.5),
+                    "p95": stats.percentile(0.95),
+                    "error_rate": stats.error_rate(),
+                    "cooling_down": stats.cooldown_until > time.monotonic(),
+                }
+                for name, stats in self._stats.items()
+            }
+
+
+def create_router(backends_json: str | None = config.LLM_BACKENDS,
+                  routes_json: str | None = config.LLM_ROUTES) -> LLMRouter:
+    """Роутер по настройкам LLM_BACKENDS/LLM_ROUTES; без них — один локальный Ollama."""
+    specs = json.loads(backends_json) if backends_json else {"local": {"kind": "ollama", "model": config.LLM_MODEL}}
+    routes = json.loads(routes_json) if routes_json else {}
+    backends = {name: create_backend(name, spec) for name, spec in specs.items()}
+    return LLMRouter(backends, routes)
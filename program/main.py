@@ -4,17 +4,54 @@ import core
 from core import Process, FileSender
 import keyboards
 import database
-from theory import handler as theory
-from sqlalchemy import and_ as SQL_AND
+from dispatcher import Dispatcher
+from webhook import WebhookServer
+from outbound import scheduler as outbound
+import content
+import generator
+from enums import AIMode
+from LLM import assistant
+from theory import handler as theory, algebra_theory, math as theory_sections
+from taskpool import TaskPool
+from streaming import stream_reply
+from aijobs import AIJobQueue
 
 POLLING_TIMEOUT = 60
 POLLING_NONE_STOP = True
 
-bot = telebot.TeleBot(config.BOT_TOKEN)
+# При включённом диспетчере polling только раздаёт обновления по очередям чатов,
+# а обработка идёт в пуле воркеров диспетчера
+bot = telebot.TeleBot(config.BOT_TOKEN, threaded=not config.DISPATCHER_ENABLED)
+dispatcher = Dispatcher() if config.DISPATCHER_ENABLED else None
 
 Process.set_bot(bot)
 FileSender.set_bot(bot)
 
+
+def _produce_pooled_task(topic: str) -> str | None:
+    """Задача для пула от модели; ответы-ошибки в пул не попадают."""
+    text = assistant.generate_task(topic)
+    return text if text.startswith("Задача:") else None
+
+
+def _pool_topics() -> list[str]:
+    """Темы пула: те, что шаблоны generator не покрывают (их задачи строятся мгновенно и без пула)."""
+    if config.TASK_POOL_TOPICS:
+        topics = [topic.strip().lower() for topic in config.TASK_POOL_TOPICS.split(",") if topic.strip()]
+    else:
+        topics = [*theory_sections.keys(), *algebra_theory.keys()]
+    return [topic for topic in dict.fromkeys(topics) if generator.find_topic(topic) is None]
+
+
+# Запросы к модели выполняются отдельно от обработки обновлений
+ai_jobs = AIJobQueue(bot)
+
+# Пул пополняется только пока во входящих очередях и в очереди AI нет работы
+task_pool = TaskPool(
+    _produce_pooled_task, _pool_topics(),
+    is_idle=lambda: ai_jobs.pending() == 0 and (dispatcher is None or dispatcher.pending() == 0),
+) if config.TASK_POOL_ENABLED else None
+
 START_COMMANDS = ["/start", "/главная", "/меню", "/menu", "/main", "/home", "старт", "главная"]
 HELP_COMMANDS = ["помощь", "help", "/help"]
 
@@ -22,23 +59,24 @@ HELP_COMMANDS = ["помощь", "help", "/help"]
 FLOW_CANCEL = "отмена"
 FLOW_DELETE = "delete_profile"
 FLOW_SEARCH = "search_student"
+FLOW_AI = "ai_request"
+ATTACH_ALL = "прикрепить всех"
+CLASS_SET_SIZE = 30  # размер набора задач, если у учителя ещё нет учеников
 
 # Память активных сценариев в рантайме: chat_id -> {"type": str, "step": str, "data": dict}
 ACTIVE_FLOWS: dict[str, dict] = {}
 
 
 def _out(bot_instance, chat_id: str, text: str, kb=None):
-    try:
-        bot_instance.send_message(chat_id, text, reply_markup=kb)
-    except Exception as e:
-        print(f"Не удалось отправить сообщение: {e}")
+    # Отправка идёт через общую очередь исходящих, обработчик не ждёт сеть
+    outbound.send(bot_instance.send_message, chat_id, text, reply_markup=kb)
 
 
 def _handle_theory(request: str, bot_instance, chat_id: str) -> bool:
     try:
         def text_out(text: str, kb=None):
             _out(bot_instance, chat_id, text, kb)
-        return bool(theory(request, text_out, chat_id))
+        return bool(theory(request, text_out, chat_id, bot_instance))
     except Exception as e:
         print(f"Ошибка в обработчике теории: {e}")
         return False
@@ -46,21 +84,16 @@ def _handle_theory(request: str, bot_instance, chat_id: str) -> bool:
 
 def _show_teacher_students(bot_instance, chat_id: str):
     try:
-        me = database.Client(chat_id)
-        attached = getattr(me, "my_students", None)
-        if not attached:
-            _out(bot_instance, chat_id, "У вас пока нет прикрепленных учеников", keyboards.Teacher.main)
-            return
-        ids = attached.split(";")[:-1]
-        if not ids:
+        # Один JOIN по таблице связей, уже отсортированный по фамилии и имени
+        students = database.Manager.get_students(chat_id)
+        if not students:
             _out(bot_instance, chat_id, "У вас пока нет прикрепленных учеников", keyboards.Teacher.main)
             return
         lines = ["Ваши ученики:", ""]
-        for sid in ids:
-            st = database.Client(sid)
-            school = f"школа №{st.school}" if getattr(st, "school", None) else "школа не указана"
-            grade = f"{st.grade} класс" if getattr(st, "grade", None) else "класс не указан"
-            lines.append(f"• {st.name} {st.surname} ({school}, {grade})")
+        for st in students:
+            school = f"школа №{st['school']}" if st.get("school") else "школа не указана"
+            grade = f"{st['grade']} класс" if st.get("grade") else "класс не указан"
+            lines.append(f"• {st['name']} {st['surname']} ({school}, {grade})")
         _out(bot_instance, chat_id, "\n".join(lines), keyboards.Teacher.main)
     except Exception as e:
         print(f"Ошибка показа учеников: {e}")
@@ -111,6 +144,84 @@ def _handle_delete_flow(request: str, chat_id: str) -> bool:
         return True
 
 
+def _start_ai_flow(chat_id: str, mode: AIMode | None, question: str, kb=None) -> None:
+    """Запрашивает тему и ждёт её следующим сообщением. mode=None — набор задач для класса."""
+    try:
+        ACTIVE_FLOWS[chat_id] = {"type": FLOW_AI, "step": "ask_topic", "data": {"mode": mode, "kb": kb}}
+        _out(bot, chat_id, question, keyboards.cancel)
+    except Exception as e:
+        print(f"Не удалось запустить сценарий AI помощника: {e}")
+
+
+def _handle_ai_flow(request: str, chat_id: str) -> bool:
+    try:
+        flow = ACTIVE_FLOWS.get(chat_id)
+        if not flow or flow.get("type") != FLOW_AI:
+            return False
+        ACTIVE_FLOWS.pop(chat_id, None)
+        data = flow.get("data")
+        if request == FLOW_CANCEL:
+            _out(bot, chat_id, "Действие отменено", data.get("kb"))
+            return True
+
+        mode, kb = data.get("mode"), data.get("kb")
+        if mode is None:
+            _out_long(chat_id, _generate_class_set(chat_id, request), kb)
+            return True
+        if mode == AIMode.GENERATE_TASK:
+            task = _take_pooled_task(chat_id, request)
+            if task:
+                _out(bot, chat_id, task, kb)
+                return True
+
+        # Генерация идёт в очереди AI: остальные сообщения обрабатываются, не дожидаясь модели
+        if ai_jobs.has_job(chat_id):
+            _out(bot, chat_id, "Предыдущий запрос к AI помощнику ещё выполняется, подождите", kb)
+        elif not ai_jobs.submit(chat_id, _answer_ai, chat_id, mode, request, kb):
+            _out(bot, chat_id, "AI помощник сейчас перегружен, повторите запрос через минуту", kb)
+        return True
+    except Exception as e:
+        print(f"Ошибка сценария AI помощника: {e}")
+        ACTIVE_FLOWS.pop(chat_id, None)
+        _out(bot, chat_id, "Не удалось выполнить запрос к AI помощнику")
+        return True
+
+
+def _answer_ai(chat_id: str, mode: AIMode, request: str, kb=None) -> None:
+    """Выполняется воркером очереди AI: получает ответ модели и отправляет его в чат."""
+    try:
+        if config.STREAM_ENABLED and mode != AIMode.GENERATE_TASK:
+            # Ответ появляется сразу и дописывается по мере генерации
+            stream_reply(bot, chat_id, assistant.respond_stream(mode, request), kb)
+        else:
+            _out_long(chat_id, assistant.respond(mode, request), kb)
+    except Exception as e:
+        print(f"Ошибка запроса к AI помощнику: {e}")
+        _out(bot, chat_id, "Не удалось выполнить запрос к AI помощнику", kb)
+
+
+def _out_long(chat_id: str, text: str, kb=None) -> None:
+    """Длинный текст несколькими сообщениями; клавиатура — у последнего."""
+    chunks = content.split_message(text)
+    for i, chunk in enumerate(chunks):
+        _out(bot, chat_id, chunk, kb if i == len(chunks) - 1 else None)
+
+
+def _take_pooled_task(chat_id: str, request: str) -> str | None:
+    """Готовая задача из пула; None — пул выключен, тема не из пула или задачи кончились."""
+    if task_pool is None:
+        return None
+    return task_pool.take(request, chat_id)
+
+
+def _generate_class_set(chat_id: str, topic: str) -> str:
+    """Набор различных задач с ответами — по одной на каждого прикреплённого ученика."""
+    if generator.find_topic(topic) is None:
+        return "Для этой темы набор задач пока не генерируется. Выберите тему из раздела «Алгебра»"
+    count = len(database.Client(chat_id).my_students) or CLASS_SET_SIZE
+    return generator.format_practice(generator.generate(topic, count))
+
+
 def _start_search_flow(chat_id: str) -> None:
     try:
         ACTIVE_FLOWS[chat_id] = {"type": FLOW_SEARCH, "step": "ask_city", "data": {}}
@@ -165,29 +276,32 @@ def _handle_search_flow(request: str, chat_id: str) -> bool:
             if core.Validator.class_number(request):
                 data["class_number"] = request
                 # Выполнить поиск
-                condition = SQL_AND(
-                    database.Tables.Users.city == data.get("city"),
-                    database.Tables.Users.school == data.get("school"),
-                    database.Tables.Users.grade == data.get("class_number"),
-                )
+                condition = database.class_search_condition(data.get("city"), data.get("school"), data.get("class_number"))
                 results = database.Manager.search_records(database.Tables.Users, condition)
                 if results:
-                    lines = []
-                    for row in results:
-                        try:
-                            st = database.Client(row["telegram_id"])
-                            lines.append(f"{st.name} {st.surname}")
-                        except Exception:
-                            continue
+                    # search_records уже вернул строки целиком — повторно в БД не ходим
+                    lines = [f"{st.name} {st.surname}" for st in (database.Client(row["telegram_id"], row) for row in results)]
                     text = "\n".join(lines) if lines else "ничего не найдено"
                     _out(bot, chat_id, text, keyboards.Teacher.attached)
+                    # Ждём подтверждения «прикрепить всех»
+                    data["found"] = [row["telegram_id"] for row in results]
+                    flow["step"] = "confirm_attach"
                 else:
                     _out(bot, chat_id, "ничего не найдено")
-                ACTIVE_FLOWS.pop(chat_id, None)
+                    ACTIVE_FLOWS.pop(chat_id, None)
                 return True
             else:
                 _out(bot, chat_id, "Некорректный класс. Попробуйте снова или введите 'отмена'")
                 return True
+        if step == "confirm_attach":
+            ACTIVE_FLOWS.pop(chat_id, None)
+            if request != ATTACH_ALL:
+                return False
+            if database.Manager.attach_students(chat_id, data.get("found", [])):
+                _out(bot, chat_id, "Ученики прикреплены", keyboards.Teacher.main)
+            else:
+                _out(bot, chat_id, "Не удалось прикрепить учеников", keyboards.Teacher.main)
+            return True
         return False
     except Exception as e:
         print(f"Ошибка сценария поиска: {e}")
@@ -198,10 +312,28 @@ def _handle_search_flow(request: str, chat_id: str) -> bool:
 
 @bot.message_handler()
 def main(msg):
+    if dispatcher is None:
+        handle_message(msg)
+        return
+    if not dispatcher.submit(str(msg.chat.id), handle_message, msg):
+        _out(bot, str(msg.chat.id), "Бот сейчас перегружен, повторите запрос чуть позже")
+
+
+def process_raw_updates(raw_updates: list[dict]) -> None:
+    """Передаёт обновления из webhook тем же обработчикам, что и polling."""
+    updates = [telebot.types.Update.de_json(raw) for raw in raw_updates]
+    bot.process_new_updates(updates)
+
+
+def handle_message(msg):
     try:
         chat_id = str(msg.chat.id)
         request = core.transform_request(msg.text)
 
+        # 0) Ожидаемая тема для AI помощника (иначе её перехватит раздел теории)
+        if _handle_ai_flow(request, chat_id):
+            return
+
         # 1) Теоретические материалы (единые для всех)
         if _handle_theory(request, bot, chat_id):
             return
@@ -255,6 +387,10 @@ def main(msg):
                     _out(bot, chat_id, "Функция отправки задания классу в упрощенной версии пока недоступна", keyboards.Teacher.main)
             elif request == "проверить задания" or request == "проверить индивидуальные задания" or request == "задания для класса":
                 _out(bot, chat_id, "Функция проверки заданий в упрощенной версии пока недоступна", keyboards.Teacher.main)
+            elif request == "сгенерировать задание":
+                _start_ai_flow(chat_id, AIMode.GENERATE_TASK, "Укажите тему, по которой сгенерировать одно задание (без решения)", keyboards.Teacher.homework)
+            elif request == "сгенерировать для класса":
+                _start_ai_flow(chat_id, None, "Укажите тему, по которой сгенерировать задания для класса", keyboards.Teacher.homework)
             elif request == "ai помощник":
                 _out(bot, chat_id, "Раздел AI Помощник", keyboards.Teacher.ai_helper)
             elif request == "удалить профиль":
@@ -277,10 +413,20 @@ def main(msg):
             elif request in ("получить задания", "отправить решение"):
                 _out(bot, chat_id, "Функция работы с заданиями в упрощенной версии пока недоступна", keyboards.Student.main)
             elif request == "сгенерировать задание":
-                _out(bot, chat_id, "Укажите тему, по которой сгенерировать одно задание (без решения)")
+                _start_ai_flow(chat_id, AIMode.GENERATE_TASK, "Укажите тему, по которой сгенерировать одно задание (без решения)", keyboards.Student.task)
+            elif request == "практика":
+                _start_ai_flow(chat_id, AIMode.PRACTICE, "Укажите тему для практики", keyboards.Student.task)
             elif request == "ai помощник":
                 _out(bot, chat_id, "Раздел AI Помощник", keyboards.Student.ai_helper)
-            elif request in ("практика", "проверить решение"):
+            elif request == "объяснить теорию":
+                _start_ai_flow(chat_id, AIMode.EXPLAIN, "Какую тему объяснить?", keyboards.Student.ai_helper)
+            elif request == "помощь с задачей":
+                _start_ai_flow(chat_id, AIMode.HELP_PROBLEM, "Пришлите условие задачи", keyboards.Student.ai_helper)
+            elif request == "получить советы":
+                _start_ai_flow(chat_id, AIMode.TIPS, "По какой теме дать советы?", keyboards.Student.ai_helper)
+            elif request == "план обучения":
+                _start_ai_flow(chat_id, AIMode.PLAN, "Какую тему вы хотите изучить?", keyboards.Student.ai_helper)
+            elif request == "проверить решение":
                 _out(bot, chat_id, "Функция AI помощника в упрощенной версии пока недоступна", keyboards.Student.ai_helper)
             elif request == "удалить профиль":
                 _start_delete_flow(chat_id)
@@ -296,10 +442,24 @@ def main(msg):
             _out(bot, chat_id, "Неизвестная команда")
     except Exception as e:
         print(f"Ошибка обработки сообщения: {e}")
-        try:
-            bot.send_message(msg.chat.id, "Произошла внутренняя ошибка обработки сообщения")
-        except Exception as inner_e:
-            print(f"Не удалось отправить уведомление об ошибке: {inner_e}")
+        _out(bot, str(msg.chat.id), "Произошла внутренняя ошибка обработки сообщения")
 
 if __name__ == "__main__":
-    bot.polling(none_stop=POLLING_NONE_STOP, timeout=POLLING_TIMEOUT)
\ No newline at end of file
+    if config.WEBHOOK_ENABLED:
+        # Без адреса set_webhook молча отключит приём обновлений, без секрета сервер примет запросы от кого угодно
+        missing = [name for name in ("WEBHOOK_URL", "WEBHOOK_SECRET") if not getattr(config, name)]
+        if missing:
+            raise SystemExit(f"Режим webhook включён, но не заданы: {', '.join(missing)}")
+    outbound.start()
+    content.store.start_watching()
+    ai_jobs.start()
+    if task_pool is not None:
+        task_pool.start()
+    if dispatcher is not None:
+        dispatcher.start()
+    if config.WEBHOOK_ENABLED:
+        bot.remove_webhook()
+        bot.set_webhook(url=config.WEBHOOK_URL, secret_token=config.WEBHOOK_SECRET)
+        WebhookServer(process_raw_updates).serve_forever()
+    else:
+        bot.polling(none_stop=POLLING_NONE_STOP, timeout=POLLING_TIMEOUT)
\ No newline at end of file
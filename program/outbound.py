@@ -0,0 +1,206 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+import config
+
+PRIORITY_INTERACTIVE = 0  # ответы на действия пользователя
+PRIORITY_BULK = 1         # массовые рассылки (например, задание всему классу)
+
+MAX_IDLE_BUCKETS = 10000
+
+
+class TokenBucket:
+    """Классический token bucket: `rate` токенов в секунду, не больше `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Сколько секунд ждать до появления токена (0 — можно сейчас)."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class _Job:
+    __slots__ = ("method", "chat_id", "args", "kwargs", "priority", "future", "attempt")
+
+    def __init__(self, method, chat_id, args, kwargs, priority):
+        self.method = method
+        self.chat_id = chat_id
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.future = Future()
+        self.attempt = 0
+
+
+class OutboundScheduler:
+    """Единая очередь исходящих вызовов Bot API.
+
+    Соблюдает глобальный и поканальный лимиты, повторяет запрос после 429
+    с учётом Retry-After и обслуживает интерактивные ответы раньше массовых.
+    Сообщения одного чата отправляются строго по порядку.
+    Пока планировщик не запущен, вызовы выполняются синхронно.
+    """
+
+    def __init__(self, global_rate: float = config.OUTBOUND_GLOBAL_RATE,
+                 chat_rate: float = config.OUTBOUND_CHAT_RATE,
+                 chat_burst: int = config.OUTBOUND_CHAT_BURST,
+                 workers: int = config.OUTBOUND_WORKERS,
+                 max_retries: int = config.OUTBOUND_MAX_RETRIES):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.workers = max(1, workers)
+        self.max_retries = max_retries
+
+        self._global_bucket = TokenBucket(global_rate, global_rate)
+        self._chat_buckets: dict[str, TokenBucket] = {}
+        self._lanes = [OrderedDict(), OrderedDict()]  # приоритет -> chat_id -> очередь
+        self._busy = set()                             # чаты с запросом «в полёте»
+        self._blocked_until: dict[str, float] = {}     # chat_id -> время окончания Retry-After
+        self._cond = threading.Condition()
+        self._running = False
+        self._threads = []
+
+    def start(self) -> None:
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"outbound-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, wait: bool = True) -> None:
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        self._threads = []
+
+    def send(self, method: callable, chat_id, *args, priority: int = PRIORITY_INTERACTIVE, **kwargs) -> Future:
+        """Ставит вызов `method(chat_id, *args, **kwargs)` в очередь и возвращает Future с его результатом."""
+        priority = min(max(priority, PRIORITY_INTERACTIVE), PRIORITY_BULK)
+        job = _Job(method, str(chat_id), (chat_id, *args), kwargs, priority)
+        with self._cond:
+            if self._running:
+                lane = self._lanes[priority]
+                lane.setdefault(job.chat_id, deque()).append(job)
+                self._cond.notify()
+                return job.future
+        self._execute(job)
+        return job.future
+
+    def _chat_bucket(self, chat_id: str, now: float) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= MAX_IDLE_BUCKETS:
+                self._chat_buckets = {key: value for key, value in self._chat_buckets.items() if not value.is_full(now)}
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _next_job(self, now: float):
+        """Выбирает следующий готовый к отправке запрос. Возвращает (job, сколько ждать)."""
+        wait = self._global_bucket.delay(now)
+        if wait > 0:
+            return None, wait
+        wait = None
+        for lane in self._lanes:
+            for chat_id, chat_queue in lane.items():
+                if chat_id in self._busy:
+                    continue
+                chat_wait = self._blocked_until.get(chat_id, 0) - now
+                if chat_wait <= 0:
+                    self._blocked_until.pop(chat_id, None)
+                    chat_wait = self._chat_bucket(chat_id, now).delay(now)
+                if chat_wait > 0:
+                    wait = chat_wait if wait is None else min(wait, chat_wait)
+                    continue
+                job = chat_queue.popleft()
+                if not chat_queue:
+                    del lane[chat_id]
+                self._global_bucket.take(now)
+                self._chat_bucket(chat_id, now).take(now)
+                self._busy.add(chat_id)
+                return job, None
+        return None, wait
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                job = None
+                while self._running:
+                    job, wait = self._next_job(time.monotonic())
+                    if job is not None:
+                        break
+                    self._cond.wait(timeout=wait)
+                if job is None:
+                    return
+            try:
+                self._execute(job)
+            finally:
+                with self._cond:
+                    self._busy.discard(job.chat_id)
+                    self._cond.notify_all()
+
+    def _execute(self, job: _Job) -> None:
+        try:
+            # После 429 файл нужно отправить заново с начала
+            for arg in job.args:
+                if hasattr(arg, "seek"):
+                    arg.seek(0)
+            job.future.set_result(job.method(*job.args, **job.kwargs))
+        except Exception as e:
+            retry_after = _retry_after(e)
+            if retry_after is not None and job.attempt < self.max_retries and self._requeue(job, retry_after):
+                return
+            print(f"Не удалось отправить сообщение: {e}")
+            job.future.set_exception(e)
+
+    def _requeue(self, job: _Job, retry_after: float) -> bool:
+        """Возвращает запрос в начало очереди чата после 429. False — если планировщик остановлен."""
+        with self._cond:
+            if not self._running:
+                return False
+            job.attempt += 1
+            self._blocked_until[job.chat_id] = time.monotonic() + retry_after
+            lane = self._lanes[job.priority]
+            lane.setdefault(job.chat_id, deque()).appendleft(job)
+            lane.move_to_end(job.chat_id, last=False)
+            return True
+
+
+def _retry_after(error: Exception) -> float | None:
+    """Извлекает Retry-After из ошибки Telegram 429 (ApiTelegramException)."""
+    if getattr(error, "error_code", None) != 429:
+        return None
+    result = getattr(error, "result_json", None) or {}
+    try:
+        return float(result.get("parameters", {}).get("retry_after", 1))
+    except (TypeError, ValueError):
+        return 1.0
+
+
+scheduler = OutboundScheduler()
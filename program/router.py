@@ -31,7 +31,7 @@ def _try_theory(request: str, bot, chat_id: str) -> bool:
                 bot.send_message(chat_id, text, reply_markup=kb)
             except Exception as e:
                 print(f"Не удалось отправить сообщение из theory: {e}")
-        return bool(theory(request, text_out, chat_id))
+        return bool(theory(request, text_out, chat_id, bot))
     except Exception as e:
         print(f"Ошибка обработки теории: {e}")
         return False
@@ -0,0 +1,260 @@
+"""Семантический кэш ответов модели для режимов объяснений.
+
+Запрос переводится в вектор (эмбеддинг), и среди прошлых ответов того же
+режима ищется ближайший по косинусной близости. Если близость не ниже
+порога, ответ возвращается без обращения к модели.
+"""
+import atexit
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import zlib
+import config
+import resource
+from enums import AIMode
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+SEMANTIC_MODES = (AIMode.EXPLAIN, AIMode.TIPS, AIMode.PLAN)
+
+# Слова запроса, не несущие темы: "объясни дискриминант" и "как решать через дискриминант" — об одном
+STOP_WORDS = frozenset((
+    "объясни", "объяснить", "объясните", "расскажи", "расскажите", "покажи", "дай", "дайте", "напиши",
+    "как", "что", "такое", "это", "через", "про", "о", "об", "по", "в", "на", "и", "с", "для", "мне",
+    "тему", "тема", "теме", "пожалуйста", "решать", "решить", "решается", "решаются", "нужно", "можно",
+    "советы", "совет", "план", "обучения", "изучить", "понять", "найти", "найди", "формула", "формулу",
+))
+# Слова, меняющие смысл запроса при почти том же наборе триграмм: "как не решать" / "как решать",
+# "обратная теорема виета" / "теорема виета". Короткие сравниваются целиком, длинные — по началу слова
+QUALIFIERS = ("не", "ни", "нет", "без", "кроме", "обратн", "неполн", "приведенн", "систем")
+
+
+def content_words(text: str) -> list[str]:
+    """Слова запроса без служебных, в нижнем регистре."""
+    return [w for w in re.findall(r"[a-zа-я0-9²³]+", text.lower().replace("ё", "е")) if w not in STOP_WORDS]
+
+
+def qualifiers(text: str) -> frozenset[str]:
+    """Отрицания и уточнения из QUALIFIERS, встречающиеся в запросе."""
+    return frozenset(
+        qualifier for word in content_words(text) for qualifier in QUALIFIERS
+        if word == qualifier or (len(qualifier) > 3 and word.startswith(qualifier))
+    )
+
+
+class HashingEmbedder:
+    """Локальный эмбеддер без модели: хэширование слов и их символьных триграмм.
+
+    Триграммы делают вектор устойчивым к падежам ("дискриминант" / "дискриминанта").
+    """
+
+    name = "local"
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+
+    def embed(self, text: str):
+        features = []
+        for word in content_words(text):
+            features.append(word)
+            padded = f"#{word}#"
+            features += [padded[i:i + 3] for i in range(len(padded) - 2)]
+        indices = [zlib.crc32(feature.encode("utf-8")) % self.dim for feature in features]
+        return numpy.bincount(numpy.array(indices, dtype=numpy.int64), minlength=self.dim).astype(numpy.float32)
+
+
+class OpenAIEmbedder:
+    """Эмбеддинги через обёртку OpenAIEmbeddings из utils (нужны пакеты openai и langchain-openai)."""
+
+    name = "openai"
+
+    def __init__(self, api_key: str = config.LLM_API_KEY, model: str = config.SEMANTIC_CACHE_MODEL):
+        from utils import OpenAIEmbeddings
+        self.name = f"openai:{model}"
+        self.client = OpenAIEmbeddings(course_api_key=api_key, model=model)
+
+    def embed(self, text: str):
+        return numpy.array(self.client.embed_query(text), dtype=numpy.float32)
+
+
+def create_embedder(kind: str = config.SEMANTIC_CACHE_EMBEDDER):
+    if kind == "openai":
+        return OpenAIEmbedder()
+    return HashingEmbedder()
+
+
+class SemanticCache:
+    """Индекс ответов в матрице NumPy: одна строка — нормированный вектор запроса.
+
+    Кроме близости векторов, у запросов должны совпадать отрицания и
+    уточнения (QUALIFIERS): близость триграмм у "теорему виета" и "обратную
+    теорему виета" — 0.8, у "как решать" и "как не решать" — ещё выше.
+    Размер ограничен `max_size`; при переполнении вытесняется ответ, который
+    дольше всех не был востребован. Индекс сохраняется на диск не чаще раза
+    в `save_delay` секунд (и при выходе) и загружается при старте, если
+    эмбеддер не сменился.
+    """
+
+    def __init__(self, embedder, threshold: float = config.SEMANTIC_CACHE_THRESHOLD,
+                 max_size: int = config.SEMANTIC_CACHE_SIZE, path: str | None = config.SEMANTIC_CACHE_PATH,
+                 save_delay: float = config.SEMANTIC_CACHE_SAVE_DELAY):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.max_size = max(1, max_size)
+        self.path = os.path.normpath(os.path.join(resource.PROJECT_ROOT, path)) if path else None
+        self.save_delay = save_delay
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()   # запись файла идёт вне _lock, но не двумя потоками сразу
+        self._save_timer = None
+        self._dirty = False
+        self._vectors = None                 # матрица max_size x dim, создаётся по первому вектору
+        self._last_used = numpy.zeros(self.max_size, dtype=numpy.float64)
+        self._modes: list[str | None] = []   # режим каждой строки матрицы
+        self._answers: list[str] = []
+        self._prompts: list[str] = []
+        self._qualifiers: list[frozenset] = []  # qualifiers запроса каждой строки
+        self._load()
+        if self.path:
+            atexit.register(self.flush)
+
+    def _vector(self, text: str):
+        vector = numpy.asarray(self.embedder.embed(text), dtype=numpy.float32)
+        norm = numpy.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def lookup(self, mode: AIMode, text: str) -> str | None:
+        """Готовый ответ на близкий по смыслу запрос того же режима или None."""
+        vector = self._vector(text)
+        marks = qualifiers(text)
+        with self._lock:
+            if vector is None or not self._answers or vector.shape[0] != self._vectors.shape[1]:
+                self.misses += 1
+                return None
+            count = len(self._answers)
+            similarity = self._vectors[:count] @ vector
+            similarity[numpy.array(self._modes) != mode.value] = -1.0
+            close = numpy.flatnonzero(similarity >= self.threshold)
+            best = next((int(row) for row in close[numpy.argsort(-similarity[close])]
+                         if marks == self._qualifiers[row]), None)
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._last_used[best] = time.time()
+            return self._answers[best]
+
+    def add(self, mode: AIMode, text: str, answer: str) -> None:
+        vector = self._vector(text)
+        if vector is None or not answer:
+            return
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                self._reset(vector.shape[0])
+            if len(self._answers) < self.max_size:
+                row = len(self._answers)
+                self._modes.append(mode.value)
+                self._answers.append(answer)
+                self._prompts.append(text)
+                self._qualifiers.append(qualifiers(text))
+            else:
+                row = int(numpy.argmin(self._last_used))
+                self._modes[row], self._answers[row], self._prompts[row] = mode.value, answer, text
+                self._qualifiers[row] = qualifiers(text)
+            self._vectors[row] = vector
+            self._last_used[row] = time.time()
+            self._schedule_save()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._answers), "hits": self.hits, "misses": self.misses}
+
+    def _reset(self, dim: int) -> None:
+        self._vectors = numpy.zeros((self.max_size, dim), dtype=numpy.float32)
+        self._last_used[:] = 0
+        self._modes, self._answers, self._prompts, self._qualifiers = [], [], [], []
+
+    def _schedule_save(self) -> None:
+        """Вызывается под _lock: откладывает запись, чтобы серия добавлений сохранялась одним файлом."""
+        if not self.path:
+            return
+        self._dirty = True
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self) -> None:
+        """Сохраняет индекс на диск, если он менялся с прошлого сохранения."""
+        with self._save_lock:
+            with self._lock:
+                self._save_timer = None
+                if not self._dirty:
+                    return
+                self._dirty = False
+                # Снимок под блокировкой, а сама запись — без неё, чтобы не задерживать lookup/add
+                count = len(self._answers)
+                vectors = self._vectors[:count].copy()
+                last_used = self._last_used[:count].copy()
+                meta = {"embedder": self.embedder.name, "modes": list(self._modes),
+                        "answers": list(self._answers), "prompts": list(self._prompts)}
+            self._save(vectors, last_used, meta)
+
+    def _save(self, vectors, last_used, meta: dict) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # Пишем во временный файл и подменяем, чтобы не оставить индекс недописанным
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as file:
+                numpy.savez(file, vectors=vectors, last_used=last_used,
+                            meta=numpy.array(json.dumps(meta, ensure_ascii=False)))
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Не удалось сохранить семантический кэш: {e}")
+
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with numpy.load(self.path) as data:
+                meta = json.loads(str(data["meta"]))
+                vectors, last_used = data["vectors"], data["last_used"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Не удалось загрузить семантический кэш: {e}")
+            return
+        if meta.get("embedder") != self.embedder.name or not len(vectors):
+            return
+        count = min(len(vectors), self.max_size)
+        # При уменьшении max_size оставляем самые востребованные ответы
+        keep = numpy.sort(numpy.argsort(last_used)[::-1][:count])
+        self._reset(vectors.shape[1])
+        self._vectors[:count] = vectors[keep]
+        self._last_used[:count] = last_used[keep]
+        self._modes = [meta["modes"][i] for i in keep]
+        self._answers = [meta["answers"][i] for i in keep]
+        self._prompts = [meta["prompts"][i] for i in keep]
+        self._qualifiers = [qualifiers(prompt) for prompt in self._prompts]
+
+
+def _create_cache() -> SemanticCache | None:
+    if not config.SEMANTIC_CACHE_ENABLED:
+        return None
+    if numpy is None:
+        print("Пакет numpy не установлен: семантический кэш отключён")
+        return None
+    try:
+        return SemanticCache(create_embedder())
+    except Exception as e:
+        print(f"Не удалось создать семантический кэш: {e}")
+        return None
+
+
+cache = _create_cache()
@@ -0,0 +1,107 @@
+import threading
+
+
+class Flight:
+    """Один выполняющийся запрос: его части ответа видны всем, кто к нему присоединился."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._pieces: list[str] = []
+        self._done = False
+        self._error = None
+        self.followers = 0
+
+    def publish(self, piece: str) -> None:
+        with self._cond:
+            self._pieces.append(piece)
+            self._cond.notify_all()
+
+    def finish(self, error: BaseException | None = None) -> None:
+        with self._cond:
+            self._done = True
+            self._error = error
+            self._cond.notify_all()
+
+    def __iter__(self):
+        """Части ответа с самого начала, по мере их появления."""
+        index = 0
+        while True:
+            with self._cond:
+                while index >= len(self._pieces) and not self._done:
+                    self._cond.wait()
+                pieces = self._pieces[index:]
+                done, error = self._done, self._error
+            index += len(pieces)
+            yield from pieces
+            if done and index >= len(self._pieces):
+                if error is not None:
+                    raise error
+                return
+
+    def result(self) -> str:
+        return "".join(self)
+
+
+class SingleFlight:
+    """Объединяет одинаковые запросы, выполняющиеся одновременно.
+
+    Первый вызов с ключом выполняет работу, остальные ждут его и получают тот
+    же ответ. После завершения ключ освобождается: следующий запрос снова
+    выполняется (повторное использование готовых ответов — задача кэша).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: dict = {}
+
+    def _join(self, key) -> tuple[Flight, bool]:
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.followers += 1
+                return flight, False
+            flight = Flight()
+            self._flights[key] = flight
+            return flight, True
+
+    def _land(self, key, flight: Flight, error: BaseException | None = None) -> None:
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.finish(error)
+
+    def do(self, key, function: callable, *args, **kwargs):
+        """Результат `function(*args, **kwargs)`, общий для одновременных вызовов с одним ключом."""
+        flight, leader = self._join(key)
+        if not leader:
+            return flight.result()
+        try:
+            result = function(*args, **kwargs)
+        except BaseException as e:
+            self._land(key, flight, e)
+            raise
+        flight.publish(result)
+        self._land(key, flight)
+        return result
+
+    def stream(self, key, function: callable, *args, **kwargs):
+        """Как do, но для генератора частей: присоединившиеся получают части по мере появления."""
+        flight, leader = self._join(key)
+        if not leader:
+            yield from flight
+            return
+        error = None
+        try:
+            for piece in function(*args, **kwargs):
+                flight.publish(piece)
+                yield piece
+        except BaseException as e:
+            # GeneratorExit тоже сюда: ведущий бросил чтение — ждущих нельзя оставлять навсегда
+            error = e if not isinstance(e, GeneratorExit) else RuntimeError("Запрос прерван")
+            raise
+        finally:
+            self._land(key, flight, error)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
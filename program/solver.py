@@ -0,0 +1,486 @@
+"""Локальный решатель школьных уравнений и неравенств.
+
+Распознаёт линейные уравнения, неполные квадратные уравнения
+(ax² + bx = 0, ax² + c = 0), полные квадратные уравнения и линейные
+неравенства с одной переменной и решает их точно, пошагово, по тем же
+методам, что и материалы теории в src/math/algebra. Если ввод не подходит
+ни под один вид, solve() возвращает None и задача уходит модели.
+"""
+import math
+import re
+from fractions import Fraction
+from calculator import format_number
+
+MAX_DEGREE = 2
+MAX_EXPONENT = 10
+
+RELATIONS = {"<=": "≤", ">=": "≥", "≤": "≤", "≥": "≥", "=": "=", "<": "<", ">": ">"}
+FLIPPED = {"≤": "≥", "≥": "≤", "<": ">", ">": "<"}
+
+_MATH_CHARS = r"(?:[\d.,+\-−*/:^²()\s]|(?<![a-zа-яё])[a-zх](?![a-zа-яё]))"
+PROBLEM_PATTERN = re.compile(rf"({_MATH_CHARS}+)(<=|>=|≤|≥|=|<|>)({_MATH_CHARS}+)")
+# Допустимые формулировки перед самой записью: «реши уравнение:», «решите неравенство», «уравнение:»
+COMMAND_PATTERN = re.compile(
+    r"^(?:(?:решите|решить|реши)(?:\s+(?:уравнение|неравенство))?|уравнение|неравенство)"
+    r"(?:\s+(?:через\s+дискриминант|(по\s+теореме\s+виета)))?\s*:?\s*"
+)
+TOKEN_PATTERN = re.compile(r"\s*(?:(\d+(?:[.,]\d+)?)|([a-zх])(\d(?![\d.,]))?|([-+*/:^()²−]))")
+SUBSCRIPTS = {1: "₁", 2: "₂"}
+
+
+class SolverError(ValueError):
+    """Ввод не является поддерживаемым уравнением или неравенством."""
+
+
+class _PolynomialParser:
+    """Разбирает выражение с одной переменной в многочлен {степень: коэффициент}."""
+
+    def __init__(self, text: str):
+        self.tokens = []
+        self.variable = None
+        position = 0
+        text = text.strip()
+        while position < len(text):
+            match = TOKEN_PATTERN.match(text, position)
+            if not match:
+                raise SolverError(f"Неизвестный символ: {text[position:]!r}")
+            number, variable, exponent, operator = match.groups()
+            if number is not None:
+                self.tokens.append(("num", Fraction(number.replace(",", "."))))
+            elif variable is not None:
+                variable = "x" if variable == "х" else variable
+                if self.variable not in (None, variable):
+                    raise SolverError("Поддерживается только одна переменная")
+                self.variable = variable
+                self.tokens.append(("var", variable))
+                if exponent is not None:
+                    # «x2» — частая запись x² (так же записано и в материалах теории)
+                    self.tokens += [("op", "^"), ("num", Fraction(exponent))]
+            else:
+                operator = {"−": "-", ":": "/"}.get(operator, operator)
+                self.tokens.append(("op", operator))
+            position = match.end()
+            while position < len(text) and text[position].isspace():
+                position += 1
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def take_operator(self, operator: str) -> None:
+        if self.peek() != ("op", operator):
+            raise SolverError(f"Ожидалось {operator}")
+        self.position += 1
+
+    def parse(self) -> dict[int, Fraction]:
+        if not self.tokens:
+            raise SolverError("Пустое выражение")
+        polynomial = self.expr()
+        if self.position != len(self.tokens):
+            raise SolverError("Лишний фрагмент выражения")
+        return polynomial
+
+    def expr(self):
+        result = self.term()
+        while self.peek() in (("op", "+"), ("op", "-")):
+            operator = self.peek()[1]
+            self.position += 1
+            right = self.term()
+            result = _add(result, right if operator == "+" else _scale(right, -1))
+        return result
+
+    def term(self):
+        result = self.unary()
+        while True:
+            kind, value = self.peek()
+            if (kind, value) == ("op", "*"):
+                self.position += 1
+                result = _multiply(result, self.unary())
+            elif (kind, value) == ("op", "/"):
+                self.position += 1
+                divisor = self.unary()
+                if set(divisor) - {0} or divisor.get(0, 0) == 0:
+                    raise SolverError("Деление допускается только на ненулевое число")
+                result = _scale(result, 1 / divisor[0])
+            elif kind in ("num", "var") or (kind, value) == ("op", "("):
+                # Неявное умножение: 2x, 3(x + 1), x(x - 2)
+                result = _multiply(result, self.power())
+            else:
+                return result
+
+    def unary(self):
+        if self.peek() in (("op", "-"), ("op", "+")):
+            sign = self.peek()[1]
+            self.position += 1
+            operand = self.unary()
+            return _scale(operand, -1) if sign == "-" else operand
+        return self.power()
+
+    def power(self):
+        base = self.primary()
+        if self.peek() == ("op", "²"):
+            self.position += 1
+            return _power(base, 2)
+        if self.peek() == ("op", "^"):
+            self.position += 1
+            exponent = self.unary()
+            if set(exponent) - {0} or exponent.get(0, Fraction(0)).denominator != 1:
+                raise SolverError("Степень должна быть целым числом")
+            return _power(base, int(exponent.get(0, 0)))
+        return base
+
+    def primary(self):
+        kind, value = self.peek()
+        self.position += 1
+        if kind == "num":
+            return {0: value}
+        if kind == "var":
+            return {1: Fraction(1)}
+        if (kind, value) == ("op", "("):
+            result = self.expr()
+            self.take_operator(")")
+            return result
+        raise SolverError("Некорректное выражение")
+
+
+def _clean(polynomial: dict) -> dict:
+    return {degree: coefficient for degree, coefficient in polynomial.items() if coefficient != 0}
+
+
+def _add(left: dict, right: dict) -> dict:
+    result = dict(left)
+    for degree, coefficient in right.items():
+        result[degree] = result.get(degree, 0) + coefficient
+    return _clean(result)
+
+
+def _scale(polynomial: dict, factor) -> dict:
+    return _clean({degree: coefficient * factor for degree, coefficient in polynomial.items()})
+
+
+def _multiply(left: dict, right: dict) -> dict:
+    result = {}
+    for left_degree, left_coefficient in left.items():
+        for right_degree, right_coefficient in right.items():
+            degree = left_degree + right_degree
+            result[degree] = result.get(degree, 0) + left_coefficient * right_coefficient
+    return _clean(result)
+
+
+def _power(base: dict, exponent: int) -> dict:
+    if not 0 <= exponent <= MAX_EXPONENT:
+        raise SolverError("Степень вне допустимого диапазона")
+    result = {0: Fraction(1)}
+    for _ in range(exponent):
+        result = _multiply(result, base)
+    return result
+
+
+# --- Форматирование ---------------------------------------------------------
+
+def _number(value) -> str:
+    return format_number(value)
+
+
+def _coefficient(value) -> str:
+    """Коэффициент перед переменной: обыкновенная дробь берётся в скобки, (1/3)x."""
+    text = format_number(value)
+    return f"({text})" if "/" in text else text
+
+
+def _signed(value) -> str:
+    """Множитель в скобках, если он отрицательный или дробный: для записи вида 4 × (-5)."""
+    text = format_number(value)
+    return f"({text})" if value < 0 or "/" in text else text
+
+
+def _monomial(coefficient, degree: int, variable: str) -> str:
+    power = {0: "", 1: variable, 2: f"{variable}²", 3: f"{variable}³"}[degree]
+    if degree == 0:
+        return _coefficient(coefficient)
+    if coefficient == 1:
+        return power
+    if coefficient == -1:
+        return f"-{power}"
+    return f"{_coefficient(coefficient)}{power}"
+
+
+def _join(terms: list[tuple], variable: str) -> str:
+    """Записывает сумму слагаемых [(коэффициент, степень), ...]."""
+    parts = []
+    for coefficient, degree in terms:
+        if coefficient == 0:
+            continue
+        text = _monomial(abs(coefficient), degree, variable)
+        if not parts:
+            parts.append(f"-{text}" if coefficient < 0 else text)
+        else:
+            parts.append(f"- {text}" if coefficient < 0 else f"+ {text}")
+    return " ".join(parts) if parts else "0"
+
+
+def format_polynomial(polynomial: dict, variable: str = "x") -> str:
+    """Записывает многочлен {степень: коэффициент} по убыванию степеней: 2x² - 3x + 1."""
+    return _join([(polynomial.get(degree, 0), degree) for degree in sorted(polynomial, reverse=True)], variable)
+
+
+def _root(value: Fraction) -> tuple[str, Fraction | float]:
+    """Квадратный корень: точный, если возможно, иначе приближённый."""
+    numerator, denominator = math.isqrt(value.numerator), math.isqrt(value.denominator)
+    if numerator * numerator == value.numerator and denominator * denominator == value.denominator:
+        return _number(Fraction(numerator, denominator)), Fraction(numerator, denominator)
+    approximate = math.sqrt(value)
+    return f"≈ {format_number(round(approximate, 4))}", approximate
+
+
+def _root_value(text: str) -> str:
+    return text if text.startswith("≈") else f"= {text}"
+
+
+# --- Решение ---------------------------------------------------------------
+
+def extract_problem(text: str) -> tuple[str, str, str, bool] | None:
+    """Разбирает запрос вида «[реши уравнение:] левая часть, знак, правая часть».
+
+    Последний элемент — просили ли решить по теореме Виета.
+    Кроме команды в запросе не должно быть ничего: текст с условиями («при x = 5»),
+    несколько или цепочки отношений («2 < x < 5») решать локально нельзя — это задача модели.
+    """
+    text = text.lower().strip()
+    command = COMMAND_PATTERN.match(text)
+    by_vieta = bool(command and command.group(1))
+    text = text[command.end():].rstrip(" .;") if command else text.rstrip(" .;")
+    match = PROBLEM_PATTERN.fullmatch(text)
+    if not match:
+        return None
+    left, relation, right = (part.strip() for part in match.groups())
+    if not left or not right:
+        return None
+    return left, RELATIONS[relation], right, by_vieta
+
+
+def solve(text: str) -> str | None:
+    """Пошаговое решение на русском языке или None, если вид задачи не поддерживается."""
+    problem = extract_problem(text)
+    if problem is None:
+        return None
+    left_text, relation, right_text, by_vieta = problem
+    try:
+        left_parser, right_parser = _PolynomialParser(left_text), _PolynomialParser(right_text)
+        left, right = left_parser.parse(), right_parser.parse()
+    except SolverError:
+        return None
+    variables = {left_parser.variable, right_parser.variable} - {None}
+    if len(variables) != 1:
+        return None
+    variable = variables.pop()
+    difference = _add(left, _scale(right, -1))
+    degree = max(difference, default=0)
+    if degree > MAX_DEGREE or any(d < 0 for d in difference):
+        return None
+
+    header = f"{left_text} {relation} {right_text}".replace("х", "x")
+    if relation == "=":
+        if degree <= 1:
+            return _solve_linear(header, left, right, variable)
+        return _solve_quadratic(header, left, right, difference, variable, by_vieta)
+    if degree <= 1:
+        return _solve_linear_inequality(header, left, right, relation, variable)
+    return None
+
+
+def _moved_sides(left: dict, right: dict, variable: str) -> tuple[list, list]:
+    """Неизвестные — влево, числа — вправо, с противоположным знаком при переносе."""
+    unknowns = [(left.get(1, 0), 1), (-right.get(1, 0), 1)]
+    numbers = [(right.get(0, 0), 0), (-left.get(0, 0), 0)]
+    return unknowns, numbers
+
+
+def _linear_steps(header: str, left: dict, right: dict, relation: str, variable: str) -> tuple[list[str], Fraction, Fraction]:
+    steps = [header]
+    simplified = f"{format_polynomial(left, variable)} {relation} {format_polynomial(right, variable)}"
+    if simplified.replace(" ", "") != header.replace(" ", ""):
+        steps.append(simplified)
+    unknowns, numbers = _moved_sides(left, right, variable)
+    moved = f"{_join(unknowns, variable)} {relation} {_join(numbers, variable)}"
+    if moved != steps[-1]:
+        steps.append(moved)
+    a = left.get(1, 0) - right.get(1, 0)
+    b = right.get(0, 0) - left.get(0, 0)
+    collected = f"{_monomial(a, 1, variable) if a else '0'} {relation} {_number(b)}"
+    if collected != steps[-1]:
+        steps.append(collected)
+    return steps, a, b
+
+
+def _solve_linear(header: str, left: dict, right: dict, variable: str) -> str:
+    steps, a, b = _linear_steps(header, left, right, "=", variable)
+    lines = ["Линейное уравнение. Переносим неизвестные влево, числа вправо с противоположным знаком:", ""]
+    lines += steps
+    if a == 0:
+        lines += ["", "Любое число является корнем уравнения" if b == 0 else "Уравнение не имеет корней",
+                  "", f"Ответ: {variable} — любое число" if b == 0 else "Ответ: корней нет"]
+        return "\n".join(lines)
+    root = b / a
+    if a != 1:
+        lines.append(f"{variable} = {_number(b)} : {_signed(a)}")
+        lines.append(f"{variable} = {_number(root)}")
+    lines += ["", f"Ответ: {variable} = {_number(root)}"]
+    return "\n".join(lines)
+
+
+def _solve_quadratic(header: str, left: dict, right: dict, difference: dict, variable: str,
+                     by_vieta: bool = False) -> str:
+    a, b, c = (difference.get(degree, Fraction(0)) for degree in (2, 1, 0))
+    lines = []
+    standard = f"{format_polynomial(difference, variable)} = 0"
+    steps = [header]
+    if standard.replace(" ", "") != header.replace(" ", ""):
+        steps.append(standard)
+
+    if c == 0 and b == 0:
+        lines += ["Уравнение вида ax² = 0.", ""] + steps
+        lines += [f"{variable}² = 0", f"{variable} = 0", "", f"Ответ: {variable} = 0"]
+        return "\n".join(lines)
+
+    if c == 0:
+        root = -b / a
+        lines += [f"Неполное квадратное уравнение вида ax² + bx = 0. Выносим {variable} за скобку:", ""] + steps
+        lines.append(f"{variable}({_join([(a, 1), (b, 0)], variable)}) = 0")
+        lines += ["", "Произведение равно нулю, когда один из множителей равен нулю:",
+                  f"{variable} = 0 или {_join([(a, 1), (b, 0)], variable)} = 0", ""]
+        if a != 1:
+            lines.append(f"{_monomial(a, 1, variable)} = {_number(-b)}")
+            lines.append(f"{variable} = {_number(-b)} : {_signed(a)}")
+        lines.append(f"{variable} = {_number(root)}")
+        lines += ["", _roots_answer(variable, ["= 0", f"= {_number(root)}"])]
+        return "\n".join(lines)
+
+    if b == 0:
+        square = -c / a
+        lines += ["Неполное квадратное уравнение вида ax² + c = 0. Переносим c вправо и делим на a:", ""] + steps
+        lines.append(f"{_monomial(a, 2, variable)} = {_number(-c)}")
+        if a != 1:
+            lines.append(f"{variable}² = {_number(-c)} : {_signed(a)}")
+            lines.append(f"{variable}² = {_number(square)}")
+        if square < 0:
+            lines += ["", "Квадрат числа не может быть отрицательным — уравнение не имеет корней", "", "Ответ: корней нет"]
+            return "\n".join(lines)
+        root_text, root = _root(square)
+        lines.append(f"{variable} = ±√{_number(square)}")
+        lines += ["", _roots_answer(variable, [_root_value(root_text), _root_value(_negate(root_text, root))])]
+        return "\n".join(lines)
+
+    if by_vieta:
+        return _solve_by_vieta(steps, a, b, c, variable)
+    return _solve_full_quadratic(steps, a, b, c, variable)
+
+
+def _solve_by_vieta(steps: list[str], a: Fraction, b: Fraction, c: Fraction, variable: str) -> str:
+    """Приведённое уравнение с целыми корнями: корни подбираются по их сумме и произведению."""
+    roots = None
+    discriminant = b * b - 4 * a * c
+    if a == 1 and discriminant >= 0:
+        _, root = _root(discriminant)
+        if isinstance(root, Fraction):
+            roots = ((-b + root) / 2, (-b - root) / 2)
+    if roots is None or any(value.denominator != 1 for value in roots):
+        reason = "не приведённое (a ≠ 1)" if a != 1 else "не имеет целых корней"
+        solution = _solve_full_quadratic(steps, a, b, c, variable)
+        return f"Уравнение {reason}, подобрать корни по теореме Виета не получится.\n\n{solution}"
+
+    x1, x2 = roots
+    lines = ["Приведённое квадратное уравнение. Решаем по теореме Виета:", ""] + steps
+    lines += ["", f"p = {_number(b)}; q = {_number(c)}", "",
+              "Ищем числа, которые в сумме дают -p, а при перемножении — q:",
+              f"{variable}₁ + {variable}₂ = {_number(-b)}",
+              f"{variable}₁ × {variable}₂ = {_number(c)}", "",
+              f"{variable}₁ + {variable}₂ = {_number(x1)} + {_signed(x2)} = {_number(x1 + x2)}",
+              f"{variable}₁ × {variable}₂ = {_number(x1)} × {_signed(x2)} = {_number(x1 * x2)}", ""]
+    if x1 == x2:
+        lines.append(f"Ответ: {variable} = {_number(x1)}")
+    else:
+        lines.append(_roots_answer(variable, [f"= {_number(x1)}", f"= {_number(x2)}"]))
+    return "\n".join(lines)
+
+
+def _negate(text: str, value) -> str:
+    if text.startswith("≈"):
+        return f"≈ {format_number(round(-value, 4))}"
+    return _number(-value)
+
+
+def _solve_full_quadratic(steps: list[str], a: Fraction, b: Fraction, c: Fraction, variable: str) -> str:
+    lines = ["Квадратное уравнение. Решаем через дискриминант:", ""] + steps
+    lines += ["", f"a = {_number(a)}; b = {_number(b)}; c = {_number(c)}", ""]
+    discriminant = b * b - 4 * a * c
+    lines.append("D = b² - 4ac")
+    product = 4 * a * c
+    difference = f"{_number(b * b)} - {_number(product)}" if product >= 0 else f"{_number(b * b)} + {_number(-product)}"
+    lines.append(f"D = {_signed(b)}² - 4 × {_signed(a)} × {_signed(c)} = {difference} = {_number(discriminant)}")
+
+    if discriminant < 0:
+        lines += ["", "D < 0, поэтому уравнение не имеет действительных корней", "", "Ответ: корней нет"]
+        return "\n".join(lines)
+    if discriminant == 0:
+        root = -b / (2 * a)
+        lines += ["", "D = 0, уравнение имеет один корень:",
+                  f"{variable} = -b : (2a) = {_number(-b)} : {_signed(2 * a)} = {_number(root)}",
+                  "", f"Ответ: {variable} = {_number(root)}"]
+        return "\n".join(lines)
+
+    root_text, root = _root(discriminant)
+    lines += ["", f"D > 0, уравнение имеет два корня. √D {_root_value(root_text)}", ""]
+    roots = []
+    for index, sign in ((1, 1), (2, -1)):
+        value = (-b + sign * root) / (2 * a)
+        operator = "+" if sign > 0 else "-"
+        shown = format_number(value) if isinstance(value, Fraction) else f"≈ {format_number(round(value, 4))}"
+        equals = "" if shown.startswith("≈") else "= "
+        lines.append(f"{variable}{SUBSCRIPTS[index]} = (-b {operator} √D) : (2a) = ({_number(-b)} {operator} √{_number(discriminant)}) : {_signed(2 * a)} {equals}{shown}")
+        roots.append((value, shown))
+
+    # Проверка по теореме Виета для приведённого уравнения с рациональными корнями
+    if a == 1 and all(isinstance(value, Fraction) for value, _ in roots):
+        x1, x2 = roots[0][0], roots[1][0]
+        lines += ["", "Проверка по теореме Виета:",
+                  f"{variable}₁ + {variable}₂ = {_number(x1)} + {_signed(x2)} = {_number(x1 + x2)} = -b",
+                  f"{variable}₁ × {variable}₂ = {_number(x1)} × {_signed(x2)} = {_number(x1 * x2)} = c"]
+    lines += ["", _roots_answer(variable, [shown if shown.startswith("≈") else f"= {shown}" for _, shown in roots])]
+    return "\n".join(lines)
+
+
+def _roots_answer(variable: str, values: list[str]) -> str:
+    """Итоговая строка с корнями: «Ответ: x₁ = 0, x₂ = 3» (values — «= 3» или «≈ 1.4142»)."""
+    return "Ответ: " + ", ".join(f"{variable}{SUBSCRIPTS[index]} {value}" for index, value in enumerate(values, start=1))
+
+
+def _solve_linear_inequality(header: str, left: dict, right: dict, relation: str, variable: str) -> str:
+    steps, a, b = _linear_steps(header, left, right, relation, variable)
+    lines = ["Линейное неравенство. Переносим неизвестные влево, числа вправо с противоположным знаком:", ""]
+    lines += steps
+    if a == 0:
+        holds = {"<": 0 < b, ">": 0 > b, "≤": 0 <= b, "≥": 0 >= b}[relation]
+        lines += ["", f"Неравенство верно при любом {variable}" if holds else "Неравенство не имеет решений",
+                  "", f"Ответ: {variable} — любое число" if holds else "Ответ: решений нет"]
+        return "\n".join(lines)
+    bound = b / a
+    final = relation
+    if a < 0:
+        final = FLIPPED[relation]
+        lines += ["", f"Делим на отрицательное число {_number(a)} — знак неравенства меняется на противоположный:"]
+    if a != 1:
+        lines.append(f"{variable} {final} {_number(b)} : {_signed(a)}")
+        lines.append(f"{variable} {final} {_number(bound)}")
+    lines += ["", f"Ответ: {variable} ∈ {_interval(final, bound)}"]
+    return "\n".join(lines)
+
+
+def _interval(relation: str, bound: Fraction) -> str:
+    value = _number(bound)
+    return {
+        "<": f"(-∞; {value})",
+        "≤": f"(-∞; {value}]",
+        ">": f"({value}; +∞)",
+        "≥": f"[{value}; +∞)",
+    }[relation]
@@ -0,0 +1,63 @@
+import os
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool, StaticPool
+import config
+import resource
+
+
+def database_url() -> str:
+    """URL базы: DATABASE_URL из окружения или файл SQLite из resource.json (от корня проекта)."""
+    if config.DATABASE_URL:
+        return config.DATABASE_URL
+    path = os.path.normpath(os.path.join(resource.PROJECT_ROOT, resource.resource["database"]))
+    return f"sqlite:///{path}"
+
+
+def default_pool_size() -> int:
+    """Соединений столько, сколько потоков одновременно ходят в БД.
+
+    Воркеры диспетчера, очереди запросов к модели и исходящих сообщений
+    (колбэки отправки сохраняют file_id), плюс поток пополнения пула задач
+    и основной поток приёма обновлений.
+    """
+    return config.DISPATCHER_WORKERS + config.AI_WORKERS + config.OUTBOUND_WORKERS + 2
+
+
+def create_storage_engine(url: str | None = None,
+                          pool_size: int = config.DATABASE_POOL_SIZE,
+                          max_overflow: int = config.DATABASE_MAX_OVERFLOW) -> Engine:
+    """Создаёт engine с настройками под профиль хранилища.
+
+    SQLite: WAL, synchronous=NORMAL, busy_timeout, mmap и пул соединений
+    по числу потоков. Серверные БД: пул с проверкой соединения перед выдачей.
+    """
+    pool_size = pool_size or default_pool_size()
+    url = make_url(url or database_url())
+    if url.get_backend_name() != "sqlite":
+        return create_engine(url, pool_size=pool_size, max_overflow=max_overflow, pool_pre_ping=True)
+
+    if url.database in (None, "", ":memory:"):
+        # Одна общая база в памяти (локальная замена для проверок)
+        return create_engine(url, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False, "timeout": config.SQLITE_BUSY_TIMEOUT_MS / 1000},
+        poolclass=QueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+    )
+    event.listen(engine, "connect", _tune_sqlite_connection)
+    return engine
+
+
+def _tune_sqlite_connection(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(config.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA mmap_size={int(config.SQLITE_MMAP_SIZE)}")
+    finally:
+        cursor.close()
@@ -0,0 +1,86 @@
+import time
+import config
+from content import split_message
+from outbound import scheduler as outbound
+
+PLACEHOLDER = "…"
+SEND_TIMEOUT = 30  # секунды ожидания отправки сообщения, id которого нужен для правок
+
+
+class StreamingReply:
+    """Ответ, который дописывается в Telegram по мере генерации.
+
+    Сразу отправляется сообщение-заглушка, затем оно редактируется не чаще
+    раза в `interval` секунд. Когда текст подходит к `limit` символам,
+    сообщение фиксируется и продолжение идёт в новом. Все вызовы идут через
+    общую очередь исходящих, поэтому лимиты Telegram соблюдаются.
+    """
+
+    def __init__(self, bot_instance, chat_id: str, keyboard=None,
+                 interval: float = config.STREAM_EDIT_INTERVAL, limit: int = config.STREAM_MESSAGE_LIMIT):
+        self.bot = bot_instance
+        self.chat_id = chat_id
+        self.keyboard = keyboard
+        self.interval = interval
+        self.limit = limit
+
+        self._text = ""          # текст текущего сообщения
+        self._shown = ""         # что сейчас видит пользователь в текущем сообщении
+        self._sealed = []        # тексты уже зафиксированных сообщений
+        self._message_id = None
+        self._last_edit = 0.0
+        self._pending_edit = None
+
+    def start(self) -> None:
+        # Клавиатуру ответа можно прикрепить только при отправке, не при правке
+        self._message_id = self._send(PLACEHOLDER, self.keyboard)
+
+    def feed(self, piece: str) -> None:
+        self._text += piece
+        while len(self._text) > self.limit:
+            head = split_message(self._text, self.limit)[0]
+            rest = self._text[len(head):].lstrip()
+            self._edit(head, force=True)
+            self._sealed.append(head)
+            self._text, self._shown = rest, ""
+            self._message_id = self._send(rest or PLACEHOLDER)
+            self._shown = rest
+        self._edit(self._text)
+
+    def finish(self) -> str:
+        """Показывает окончательный текст и возвращает ответ целиком."""
+        if not self._text.strip() and not self._sealed:
+            self._text = "Не удалось получить ответ"
+        self._edit(self._text, force=True)
+        return "\n".join(self._sealed + [self._text])
+
+    def _send(self, text: str, keyboard=None):
+        future = outbound.send(self.bot.send_message, self.chat_id, text, reply_markup=keyboard)
+        return future.result(timeout=SEND_TIMEOUT).message_id
+
+    def _edit(self, text: str, force: bool = False) -> None:
+        text = text.strip()
+        if not text or text == self._shown or self._message_id is None:
+            return
+        now = time.monotonic()
+        if not force:
+            # Правка не чаще interval и не раньше, чем Telegram принял предыдущую
+            if now - self._last_edit < self.interval:
+                return
+            if self._pending_edit is not None and not self._pending_edit.done():
+                return
+        self._pending_edit = outbound.send(self._edit_message, self.chat_id, text, self._message_id)
+        self._shown = text
+        self._last_edit = now
+
+    def _edit_message(self, chat_id, text: str, message_id: int):
+        return self.bot.edit_message_text(text, chat_id, message_id)
+
+
+def stream_reply(bot_instance, chat_id: str, pieces, keyboard=None) -> str:
+    """Отправляет ответ из итератора частей `pieces` с прогрессивными правками."""
+    reply = StreamingReply(bot_instance, chat_id, keyboard)
+    reply.start()
+    for piece in pieces:
+        reply.feed(piece)
+    return reply.finish()
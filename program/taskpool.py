@@ -0,0 +1,98 @@
+import hashlib
+import re
+import threading
+import config
+import database
+
+
+def task_hash(text: str) -> str:
+    """sha256 условия без учёта регистра, пробелов и префикса 'Задача:'."""
+    normalized = re.sub(r"\s+", " ", text.lower().replace("ё", "е")).strip()
+    normalized = re.sub(r"^задача\s*:\s*", "", normalized)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class TaskPool:
+    """Пул готовых задач по темам, хранящийся в БД.
+
+    Пул нужен для тем, где задачу может придумать только модель. Фоновый
+    поток пополняет темы, в которых осталось меньше low_water задач,
+    до capacity — только пока бот простаивает (is_idle). Выдача идёт по
+    порядку постановки в очередь, и пользователь не получает одну и ту же
+    задачу дважды.
+    """
+
+    def __init__(self, producer, topics, capacity: int = config.TASK_POOL_CAPACITY,
+                 low_water: int = config.TASK_POOL_LOW_WATER,
+                 interval: float = config.TASK_POOL_REFILL_INTERVAL,
+                 max_attempts: int = config.TASK_POOL_MAX_ATTEMPTS,
+                 issued_ttl: float = config.TASK_POOL_ISSUED_TTL, is_idle=None):
+        self.producer = producer  # topic -> условие задачи или None
+        self.topics = tuple(topics)
+        self.capacity = max(1, capacity)
+        self.low_water = min(max(0, low_water), self.capacity)
+        self.interval = interval
+        self.max_attempts = max(1, max_attempts)
+        self.issued_ttl = issued_ttl
+        self.is_idle = is_idle or (lambda: True)
+
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def take(self, topic: str, telegram_id: str) -> str | None:
+        """Готовая задача по теме или None, если пул пуст (тогда генерировать на месте)."""
+        if topic not in self.topics:
+            return None
+        text = database.Manager.pool_take(topic, telegram_id)
+        if database.Manager.pool_size(topic) < self.low_water:
+            self._wakeup.set()
+        return text
+
+    def add(self, topic: str, text: str) -> bool:
+        return database.Manager.pool_add(topic, text, task_hash(text))
+
+    def refill(self, topic: str) -> int:
+        """Пополняет тему до capacity; прерывается, если бот занят. Возвращает число новых задач."""
+        added = failures = 0
+        while not self._stopped.is_set() and failures < self.max_attempts:
+            if database.Manager.pool_size(topic) >= self.capacity or not self.is_idle():
+                break
+            try:
+                text = self.producer(topic)
+            except Exception as e:
+                print(f"Ошибка генерации задачи для пула ({topic}): {e}")
+                text = None
+            # Неудачная генерация и повтор уже ожидающей задачи одинаково считаются промахом
+            if text and self.add(topic, text):
+                added += 1
+                failures = 0
+            else:
+                failures += 1
+        return added
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="task-pool", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            # История выдач нужна только против повторов в обозримое время, иначе таблица растёт без предела
+            database.Manager.prune_issued_tasks(self.issued_ttl)
+            for topic in self.topics:
+                if self._stopped.is_set():
+                    break
+                if database.Manager.pool_size(topic) < self.low_water:
+                    self.refill(topic)
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
@@ -1,8 +1,10 @@
+from types import MappingProxyType
 from resource import resource as res
 from core import FileSender
 import keyboards
 
-math = {
+# Таблицы только для чтения: общие для всех потоков обработки
+math = MappingProxyType({
     "алгебра": ("Выберите раздел", keyboards.algebra),
     # "геометрия": ("Выберите раздел", UI.geometry),
     "вычислительные навыки": ("Выберите нужную тему", keyboards.calculation),
@@ -13,9 +15,9 @@ math = {
     "неравенства": ("Выберите тему", keyboards.inequality),
     "тригонометрия": ("Выберите тему", keyboards.trigonometry),
     # "работа с формулами": (...),
-}
+})
 
-algebra_theory = {
+algebra_theory = MappingProxyType({
     "действия с обычными дробями"        : FileSender(keyboards.calculation,  res["algebra"]["calculations"]["fractions_theory"], res["algebra"]["calculations"]["fractions_image"]),
     "арифметический корень"              : FileSender(keyboards.expression,   res["algebra"]["expressions"]["square_root_theory"]),
     "квадрат суммы"                      : FileSender(keyboards.AMF,          res["algebra"]["AMF"]["square_of_sum_theory"]),
@@ -33,21 +35,21 @@ algebra_theory = {
     "линейные неравенства"               : FileSender(keyboards.inequality,   res["algebra"]["inequalities"]["linear_inequalities_theory"]),
     "основные тригонометрические функции": FileSender(keyboards.trigonometry, res["algebra"]["trigonometry"]["basic_trigonometric_functions_theory"]),
     "тригонометрические уравнения"       : FileSender(keyboards.trigonometry, res["algebra"]["trigonometry"]["trigonometric_equations_theory"])
-}
+})
 
-def handler(request, text_out, chat_id):
+def handler(request, text_out, chat_id, bot=None):
     """Обрабатывает запросы к теоретическим материалам.
 
     Возвращает True, если запрос обслужен (теория отправлена или предложены
     подразделы), иначе False — чтобы дальнейшая логика обработала запрос.
+    Безопасен для одновременного вызова из нескольких потоков.
     """
-    FileSender.set_chat_id(chat_id)
     if request in math.keys():
         text_out(math[request][0], math[request][1])
         return True
 
     elif request in algebra_theory.keys():
-        algebra_theory[request].push()
+        algebra_theory[request].push(chat_id, bot)
         return True
     
     return False
\ No newline at end of file
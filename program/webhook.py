@@ -0,0 +1,115 @@
+import hmac
+import json
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import config
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+MAX_BODY_SIZE = 1024 * 1024
+
+
+class WebhookServer:
+    """Встроенный HTTP-приёмник обновлений Telegram.
+
+    Проверяет секретный токен, сразу отвечает 200 и передаёт обновления
+    в `on_updates` из отдельного потока. Тело запроса — одно обновление
+    (объект JSON) или пачка обновлений (массив JSON).
+    """
+
+    def __init__(self, on_updates: callable, host: str = config.WEBHOOK_HOST,
+                 port: int = config.WEBHOOK_PORT, path: str = config.WEBHOOK_PATH,
+                 secret: str | None = config.WEBHOOK_SECRET,
+                 queue_limit: int = config.WEBHOOK_QUEUE_LIMIT):
+        self.on_updates = on_updates
+        self.path = path
+        self.secret = secret
+        self._queue = queue.Queue(maxsize=queue_limit)
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._threads = []
+
+    @property
+    def address(self) -> tuple[str, int]:
+        """Фактический адрес сервера (удобно при port=0)."""
+        return self._server.server_address[:2]
+
+    def start(self) -> None:
+        """Запускает сервер и обработчик очереди в фоновых потоках."""
+        for target, name in ((self._server.serve_forever, "webhook-http"), (self._consume, "webhook-consumer")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def serve_forever(self) -> None:
+        """Запускает сервер в текущем потоке (для основного процесса бота)."""
+        consumer = threading.Thread(target=self._consume, name="webhook-consumer", daemon=True)
+        consumer.start()
+        self._threads.append(consumer)
+        self._server.serve_forever()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self._queue.put(None)
+
+    def _check_secret(self, token: str | None) -> bool:
+        if not self.secret:
+            return True
+        return token is not None and hmac.compare_digest(token, self.secret)
+
+    def _accept(self, body: bytes) -> int:
+        """Разбирает тело запроса и ставит обновления в очередь. Возвращает HTTP-код."""
+        try:
+            payload = json.loads(body.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return 400
+        updates = payload if isinstance(payload, list) else [payload]
+        if not all(isinstance(update, dict) for update in updates):
+            return 400
+        try:
+            self._queue.put_nowait(updates)
+        except queue.Full:
+            # Telegram повторит доставку позже
+            return 503
+        return 200
+
+    def _consume(self) -> None:
+        while True:
+            updates = self._queue.get()
+            if updates is None:
+                return
+            try:
+                self.on_updates(updates)
+            except Exception as e:
+                print(f"Ошибка обработки обновлений webhook: {e}")
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != server.path:
+                    self._reply(404)
+                    return
+                if not server._check_secret(self.headers.get(SECRET_HEADER)):
+                    self._reply(403)
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                except ValueError:
+                    length = -1
+                if length < 0 or length > MAX_BODY_SIZE:
+                    self._reply(413)
+                    return
+                self._reply(server._accept(self.rfile.read(length)))
+
+            def _reply(self, code: int):
+                self.send_response(code)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler